@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -28,7 +29,7 @@ load_dotenv(os.path.join(BASE_DIR, '.env'))
 SECRET_KEY = os.environ.get('SECRET_KEY', '')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.environ.get('DEBUG', 'True')
+DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '').split()
 
@@ -52,11 +53,24 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'shop_api.authentication.ClaimsJWTAuthentication',
+    ],
+    # orjson; без него - рендерер и парсер DRF (см. shop_api/fast_json.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'shop_api.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'shop_api.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
 MIDDLEWARE = [
+    'shop_api.middleware.MetricsMiddleware',
+    'shop_api.middleware.CompressionMiddleware',
+    'shop_api.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +78,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'shop_api.middleware.ReplicaRoutingMiddleware',
+    'shop_api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'diplom_main.urls'
@@ -96,10 +112,122 @@ DATABASES = {
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', ''),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
-        'PORT': '5432',
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Пул соединений: нативный пул django 5.2, если установлены psycopg 3 и psycopg_pool
+# (соединения проверяются при выдаче из пула), иначе постоянные соединения с проверкой перед запросом.
+# Пул у каждого процесса свой: всего соединений до DB_POOL_MAX_SIZE * число воркеров
+DB_POOL_AVAILABLE = all(find_spec(module) for module in ['psycopg', 'psycopg_pool'])
+
+if DB_POOL_AVAILABLE and os.environ.get('DB_POOL', 'True') == 'True':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),  # ожидание свободного соединения, сек
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),  # простаивающие сверх min_size соединения закрываются, сек
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# Реплики только для чтения, через пробел: host[:port][/db_name], например DB_REPLICAS="10.0.0.2 localhost/diplom_replica"
+for replica_number, replica in enumerate(os.environ.get('DB_REPLICAS', '').split(), start=1):
+    replica_host, _, replica_name = replica.partition('/')
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{replica_number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'NAME': replica_name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['shop_api.db_routers.ReplicaRouter']
+
+# алиасы, между которыми ReplicaRouter распределяет чтения
+REPLICA_ALIASES = [alias for alias in DATABASES if alias != 'default']
+# сколько секунд после записи клиент читает с основной БД (подписанная cookie replica_pin)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 2))  # при большем отставании (сек) реплика не используется
+REPLICA_LAG_CHECK_INTERVAL = int(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+
+# превышение query_budgets представлений: True - исключение QueryBudgetExceeded (для тестов), False - предупреждение в лог
+QUERY_BUDGETS_ENFORCE = os.environ.get('QUERY_BUDGETS_ENFORCE', 'False') == 'True'
+
+
+# списки (админка и API с ?page=) с оценкой числа строк по статистике PostgreSQL и EXPLAIN вместо COUNT(*),
+# если строк по оценке не меньше порога
+COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('COUNT_ESTIMATE_THRESHOLD', 100000))
+# размер страницы списков товаров, заказов и характеристик при ?page= без ?page_size=
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+
+
+# Batch API
+# максимальное количество операций в одном запросе к /api/batch/
+BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 20))
+
+
+# Warm-up (python manage.py warmup, GUNICORN_WARMUP)
+WARMUP_TIMEOUT = float(os.environ.get('WARMUP_TIMEOUT', 10))  # сек на весь прогрев, оставшиеся шаги пропускаются
+WARMUP_USERS = int(os.environ.get('WARMUP_USERS', 200))  # недавно входившие пользователи, чьи группы кэшируются
+WARMUP_POPULAR_ITEMS = int(os.environ.get('WARMUP_POPULAR_ITEMS', 20))  # самые заказываемые товары
+
+# Slow query log
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))  # 0 - журнал отключен
+# доля SELECT, для которых план берется через EXPLAIN ANALYZE (запрос выполняется повторно), по умолчанию выключено
+SLOW_QUERY_ANALYZE_RATE = float(os.environ.get('SLOW_QUERY_ANALYZE_RATE', 0))
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', 60))  # сек между EXPLAIN одного и того же запроса
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', 1000))  # несохраненных записей в процессе, сверх - отбрасываются старые
+SLOW_QUERY_FLUSH_INTERVAL = float(os.environ.get('SLOW_QUERY_FLUSH_INTERVAL', 5))  # сек между сохранениями журнала вне запросов к API
+
+
+# Metrics
+# каталог, через который воркеры gunicorn объединяют метрики; пусто - метрики только текущего процесса
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+# если задан, /metrics требует заголовок Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Compression
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'True') == 'True'
+# ответы меньше этого размера (в байтах) не сжимаются
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+# 0-11 и 1-9; выбрать уровень поможет python manage.py bench_compression
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+
+
+# Profiling
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', 0.005))
+# доля запросов, профилируемых без запроса сотрудника: PROFILING_SAMPLE_RATES=ItemView.list:0.01,OrderView.start_order:0.1
+PROFILING_SAMPLE_RATES = {
+    label: float(rate)
+    for label, _, rate in (item.partition(':') for item in os.environ.get('PROFILING_SAMPLE_RATES', '').split(',') if item)
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# При нескольких воркерах gunicorn нужен общий бэкенд (например, redis или memcached),
+# иначе сброс кэша групп виден только в текущем процессе до истечения GROUPS_CACHE_TIMEOUT
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+GROUPS_CACHE_TIMEOUT = int(os.environ.get('GROUPS_CACHE_TIMEOUT', 60))  # время жизни кэша групп пользователя, сек
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,6 +254,12 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Пул потоков для представлений, хеширующих пароли (вход, регистрация, смена пароля).
+# Запросы сверх AUTH_POOL_WORKERS + AUTH_POOL_QUEUE отклоняются с кодом 503
+AUTH_POOL_WORKERS = int(os.environ.get('AUTH_POOL_WORKERS', os.cpu_count() or 1))
+AUTH_POOL_QUEUE = int(os.environ.get('AUTH_POOL_QUEUE', 32))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -178,8 +312,15 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+
+    'TOKEN_OBTAIN_SERIALIZER': 'shop_api.serializers.ClaimsTokenObtainPairSerializer',
 }
 
+# Сколько секунд GET-запросы доверяют claims токена (id, is_staff, группы) без загрузки пользователя из БД.
+# Изменение групп или флагов пользователя отменяет доверие сразу, если CACHES общий для воркеров
+# (иначе - в пределах этого срока). 0 - всегда загружать пользователя из БД
+JWT_CLAIMS_MAX_AGE = int(os.environ.get('JWT_CLAIMS_MAX_AGE', 300))
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' # оставил эту строчку для тестов. в проде должна быть закомменитрована!
 # EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.mail.ru')
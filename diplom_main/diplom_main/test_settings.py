@@ -0,0 +1,25 @@
+'''
+Настройки тестов (pytest, см. pytest.ini).
+
+Тесты работают с PostgreSQL из тех же переменных окружения DB_*, что и settings.py:
+pytest-django создает тестовые базы test_<DB_NAME> и test_<DB_NAME>_replica (для тестов
+маршрутизации на реплики) и удаляет их после прогона
+'''
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, SIMPLE_JWT
+
+SECRET_KEY = 'test-secret-key-not-for-production-use-0123456789'
+SIMPLE_JWT = {**SIMPLE_JWT, 'SIGNING_KEY': SECRET_KEY}
+
+# хеширование паролей тестами не проверяется, а PBKDF2 замедляет создание пользователей
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# вместо реплик из DB_REPLICAS - вторая тестовая база. ReplicaRouter не мигрирует реплики, поэтому
+# схему в нее накатывает shop_api/tests/test_db_routers.py, он же включает ее в REPLICA_ALIASES
+DATABASES = {
+    'default': DATABASES['default'],
+    'replica_1': {**DATABASES['default'], 'TEST': {'NAME': f'test_{DATABASES["default"]["NAME"]}_replica', 'MIGRATE': False}},
+}
+REPLICA_ALIASES = []
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
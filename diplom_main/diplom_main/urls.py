@@ -21,6 +21,8 @@ from rest_framework_simplejwt.views import TokenRefreshView, TokenObtainPairView
 
 from shop_api.views import RegisterView, LoginView, PositionView, UserInfoOwnerView, StaffInfoView, AddressClientView, AddressManagerView, ItemInfoView
 from shop_api.views import VendorInfoView, ItemView, CategoryView, OrderView, ActivateAccountView, UploadItemsCSV, PasswordResetView, PasswordResetConfirmView
+from shop_api.views import auth_pool_view, BatchView, DBPoolStatsView, QueryReportView, ProfileListView, ProfileDownloadView, metrics_view
+from shop_api.async_views import AsyncItemListView, AsyncItemDetailView, AsyncCategoryListView, AsyncCategoryDetailView, AsyncMyOrdersView
 
 router = DefaultRouter()
 router.register('api/position/', PositionView, 'position')
@@ -36,14 +38,27 @@ router.register('api/item-info', ItemInfoView, 'item-info')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # исходя из ответов GigaChat, то лучше оставить проверку токенов на фронтенд
+    path('api/token/', auth_pool_view(TokenObtainPairView.as_view()), name='token_obtain_pair'),  # исходя из ответов GigaChat, то лучше оставить проверку токенов на фронтенд
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('api/register/', RegisterView.as_view(), name='user'),
-    path('api/login/', LoginView.as_view(), name='login'),
+    path('api/register/', auth_pool_view(RegisterView.as_view()), name='user'),
+    path('api/login/', auth_pool_view(LoginView.as_view()), name='login'),
     path('activate/<str:token>/', ActivateAccountView.as_view(), name='activate_account'),
     path('api/upload-csv/', UploadItemsCSV.as_view(), name='upload_csv'),
     path('api/password-reset/', PasswordResetView.as_view(), name='password_reset'),
-    path('api/pass_reset_email/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
+    path('api/pass_reset_email/<uidb64>/<token>/', auth_pool_view(PasswordResetConfirmView.as_view()), name='password_reset_confirm'),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    path('api/internal/db-pool/', DBPoolStatsView.as_view(), name='db_pool_stats'),
+    path('api/internal/query-report/', QueryReportView.as_view(), name='query_report'),
+    path('api/internal/profiles/', ProfileListView.as_view(), name='profiles'),
+    path('api/internal/profiles/<str:name>/', ProfileDownloadView.as_view(), name='profile_download'),
+    path('metrics', metrics_view, name='metrics'),
+
+    # асинхронные эндпоинты чтения для запуска под ASGI (gunicorn/gunicorn-asgi.service)
+    path('api/async/items/', AsyncItemListView.as_view(), name='async_items'),
+    path('api/async/items/<int:pk>/', AsyncItemDetailView.as_view(), name='async_item_detail'),
+    path('api/async/categories/', AsyncCategoryListView.as_view(), name='async_categories'),
+    path('api/async/categories/<int:pk>/', AsyncCategoryDetailView.as_view(), name='async_category_detail'),
+    path('api/async/order/get_my_orders/', AsyncMyOrdersView.as_view(), name='async_my_orders'),
 ]
 
 urlpatterns += router.urls
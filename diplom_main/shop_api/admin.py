@@ -0,0 +1,160 @@
+'''
+Админка. Списки больших таблиц (товары, заказы, позиции заказов, характеристики товаров)
+не считают строки через COUNT(*) (см. shop_api.pagination), связанные объекты для __str__
+загружаются одним запросом через select_related, а внешние ключи на большие таблицы
+выбираются через автодополнение вместо выпадающих списков со всеми строками
+'''
+from django.contrib import admin
+
+from .models import User, UserInfo, Position, StaffInfo, Address, VendorInfo, Item, Category, Order, OrderItem, ItemInfo
+from .pagination import EstimatedCountPaginator
+
+# Item.__str__ выводит название поставщика из VendorInfo
+ITEM_RELATED = ('vendor__info_as_vendor',)
+
+
+def items_with_vendor():
+    return Item.objects.select_related(*ITEM_RELATED)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    '''
+    Список без точного подсчета строк: оценка для всей таблицы
+    и без второго COUNT(*) по всей таблице при фильтрации
+    '''
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = ['email', 'first_name', 'last_name', 'is_active', 'is_staff', 'date_joined']
+    list_filter = ['is_active', 'is_staff', 'groups']
+    search_fields = ['email', 'first_name', 'last_name']
+    ordering = ['email']
+    # пароль меняется через сброс пароля, хеш в форме не показывается
+    exclude = ['password']
+    readonly_fields = ['last_login', 'date_joined']
+    filter_horizontal = ['groups', 'user_permissions']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'user_permissions':
+            # Permission.__str__ выводит приложение и модель из ContentType
+            kwargs['queryset'] = db_field.remote_field.model.objects.select_related('content_type')
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+@admin.register(UserInfo)
+class UserInfoAdmin(admin.ModelAdmin):
+    list_display = ['user', 'type_info', 'value_info']
+    list_select_related = ['user']
+    list_filter = ['type_info']
+    autocomplete_fields = ['user']
+
+
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    search_fields = ['name']
+    ordering = ['name']
+
+
+@admin.register(StaffInfo)
+class StaffInfoAdmin(admin.ModelAdmin):
+    list_display = ['user', 'position', 'manager', 'is_active']
+    list_select_related = ['user', 'position', 'manager']
+    list_filter = ['is_active', 'position']
+    search_fields = ['user__email', 'user__last_name']
+    autocomplete_fields = ['user', 'manager', 'position']
+
+    def get_queryset(self, request):
+        # StaffInfo.__str__ выводит должность и имя пользователя
+        return super().get_queryset(request).select_related('user', 'position')
+
+
+@admin.register(Address)
+class AddressAdmin(admin.ModelAdmin):
+    list_display = ['user', 'city', 'street', 'house', 'appartment']
+    list_select_related = ['user']
+    search_fields = ['user__email', 'city', 'street']
+    ordering = ['id']
+    autocomplete_fields = ['user']
+
+
+@admin.register(VendorInfo)
+class VendorInfoAdmin(admin.ModelAdmin):
+    list_display = ['name', 'inn', 'user']
+    list_select_related = ['user']
+    search_fields = ['name', 'inn', 'user__email']
+    autocomplete_fields = ['user']
+
+    def get_queryset(self, request):
+        # VendorInfo.__str__ выводит email пользователя
+        return super().get_queryset(request).select_related('user')
+
+
+@admin.register(Item)
+class ItemAdmin(LargeTableAdmin):
+    list_display = ['name', 'vendor', 'price', 'quantity', 'is_active', 'updated_at']
+    list_select_related = ITEM_RELATED
+    list_filter = ['is_active']
+    search_fields = ['name']
+    ordering = ['id']
+    autocomplete_fields = ['vendor']
+
+    def get_queryset(self, request):
+        # в том числе для автодополнения товаров на страницах заказов, категорий и характеристик
+        return super().get_queryset(request).select_related(*ITEM_RELATED)
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+    autocomplete_fields = ['items']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'items':
+            kwargs['queryset'] = items_with_vendor()
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class ItemForeignKeyMixin:
+    '''
+    Выбранный в автодополнении товар выводится через __str__: поставщик загружается тем же запросом
+    '''
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'item':
+            kwargs['queryset'] = items_with_vendor()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class OrderItemInline(ItemForeignKeyMixin, admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    autocomplete_fields = ['item']
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'state', 'total_price', 'created_at', 'closed_at']
+    list_select_related = ['user']
+    list_filter = ['state']
+    search_fields = ['user__email']
+    search_help_text = 'Поиск по email покупателя'
+    autocomplete_fields = ['user', 'address']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [OrderItemInline]
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(ItemForeignKeyMixin, LargeTableAdmin):
+    list_display = ['order', 'item', 'quantity', 'price_at_order']
+    list_select_related = ['order', *(f'item__{related}' for related in ITEM_RELATED)]
+    autocomplete_fields = ['order', 'item']
+
+
+@admin.register(ItemInfo)
+class ItemInfoAdmin(ItemForeignKeyMixin, LargeTableAdmin):
+    list_display = ['item', 'type_info', 'value_info']
+    list_select_related = [f'item__{related}' for related in ITEM_RELATED]
+    autocomplete_fields = ['item']
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ShopApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shop_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # execute wrapper ставится на соединения при их создании, поэтому обработчик подключаем до первых запросов к БД
+        from . import instrumentation, slow_queries  # noqa: F401
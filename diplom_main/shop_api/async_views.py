@@ -0,0 +1,110 @@
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+
+from .authentication import ClaimsJWTAuthentication
+from .fast_json import FastJSONRenderer
+from .models import Item, Category, Order
+from .fast_serializers import fast_item_serializer, fast_category_serializer, fast_order_serializer
+from .serializers import ItemSerializer, CategorySerializer
+from .views import ItemView
+
+
+def render_json(data, status_code=status.HTTP_200_OK, headers=None):
+    '''
+    Отдает данные тем же рендерером, что и DRF, чтобы ответы совпадали с синхронными эндпоинтами
+    '''
+    return HttpResponse(FastJSONRenderer().render(data), status=status_code, headers=headers, content_type='application/json')
+
+
+def render_error(exc):
+    data = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+    headers = None
+    if isinstance(exc, NotAuthenticated) or exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        headers = {'WWW-Authenticate': 'Bearer realm="api"'}
+    return render_json(data, exc.status_code, headers)
+
+
+class AsyncReadView(View):
+    '''
+    Базовое асинхронное представление только для чтения.
+    Запросы к БД выполняются через асинхронный ORM, поэтому под ASGI
+    ожидание БД не занимает воркер
+    '''
+    http_method_names = ['get', 'head', 'options']
+    replica_read_actions = ['get', 'head']
+    require_auth = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if self.require_auth:
+                auth = await ClaimsJWTAuthentication().aauthenticate(request)
+                if auth is None:
+                    raise NotAuthenticated()
+                request.user = auth[0]
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return render_error(exc)
+
+
+class AsyncItemListView(AsyncReadView):
+    async def get(self, request):
+        queryset = Item.objects.all()
+
+        category_id = request.GET.get('category')
+        if category_id:
+            queryset = queryset.filter(categories__id=category_id)
+
+        category_ids = request.GET.get('categories')
+        if category_ids:
+            queryset = queryset.filter(categories__id__in=category_ids.split(',')).distinct()
+
+        ordering = [field for field in request.GET.get('ordering', '').split(',') if field.lstrip('-') in ItemView.ordering_fields]
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+
+        return render_json(await fast_item_serializer.aserialize(queryset))
+
+
+class AsyncItemDetailView(AsyncReadView):
+    async def get(self, request, pk):
+        try:
+            item = await Item.objects.prefetch_related(Prefetch('categories', queryset=Category.objects.order_by('id'))).aget(pk=pk)
+        except Item.DoesNotExist:
+            # тот же текст, что у get_object_or_404 в синхронном ItemView
+            raise NotFound('No Item matches the given query.')
+        return render_json(ItemSerializer(item).data)
+
+
+class AsyncCategoryListView(AsyncReadView):
+    async def get(self, request):
+        return render_json(await fast_category_serializer.aserialize(Category.objects.all()))
+
+
+class AsyncCategoryDetailView(AsyncReadView):
+    async def get(self, request, pk):
+        try:
+            category = await Category.objects.prefetch_related(Prefetch('items', queryset=Item.objects.order_by('id').only('id'))).aget(pk=pk)
+        except Category.DoesNotExist:
+            raise NotFound('No Category matches the given query.')
+        return render_json(CategorySerializer(category).data)
+
+
+class AsyncMyOrdersView(AsyncReadView):
+    require_auth = True
+
+    async def get(self, request):
+        orders = await fast_order_serializer.aserialize(Order.objects.filter(user=request.user).exclude(state='basket'))
+
+        if not orders:
+            return render_json({
+                'status': 'error',
+                'message': 'У Вас нет заказов.'
+            }, status.HTTP_400_BAD_REQUEST)
+
+        return render_json({
+            'status': 'success',
+            'data': orders,
+        })
@@ -0,0 +1,106 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import GROUPS_CACHE_ATTR, get_claims_version, get_user_group_names
+
+CLAIMS_AT = 'claims_at'
+CLAIMS_VERSION = 'claims_version'
+
+
+def add_user_claims(token, user):
+    '''
+    Добавляет в токен данные пользователя, достаточные для аутентификации без запроса к БД
+    '''
+    token['email'] = user.email
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    token['groups'] = sorted(get_user_group_names(user))
+    token[CLAIMS_VERSION] = get_claims_version(user.pk)
+    # claims копируются в новый access-токен при refresh, поэтому их возраст считаем отдельно от iat
+    token[CLAIMS_AT] = int(time.time())
+    return token
+
+
+def get_tokens_for_user(user):
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    '''
+    JWT-аутентификация, которая для безопасных методов (GET, HEAD, OPTIONS)
+    собирает пользователя из подписанных claims токена, не обращаясь к БД.
+    Для записи, а также для токенов без claims или с устаревшими claims
+    пользователь загружается из БД как обычно.
+
+    Claims устаревают через JWT_CLAIMS_MAX_AGE секунд или раньше, если изменились
+    группы или флаги пользователя: версия прав в токене сверяется с версией в кэше
+    (одно обращение к кэшу на запрос). Кэш должен быть общим для воркеров: с LocMemCache
+    изменение видит только процесс, который его выполнил, а остальные принимают
+    прежние claims до истечения JWT_CLAIMS_MAX_AGE
+    '''
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method in SAFE_METHODS:
+            user = self.get_user_from_claims(validated_token)
+            if user is not None:
+                return user, validated_token
+
+        return self.get_user(validated_token), validated_token
+
+    async def aauthenticate(self, request):
+        '''
+        Вариант authenticate для асинхронных представлений: к БД обращается
+        только если claims устарели, и делает это вне цикла событий
+        '''
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        user = None
+        if request.method in SAFE_METHODS:
+            # версия прав читается из кэша синхронно: это быстрее, чем переключение в поток
+            user = self.get_user_from_claims(validated_token)
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
+
+    def get_user_from_claims(self, validated_token):
+        claims_at = validated_token.get(CLAIMS_AT)
+        if claims_at is None or time.time() - claims_at > settings.JWT_CLAIMS_MAX_AGE:
+            return None
+        # пользователя исключили из группы или лишили is_staff после выдачи токена
+        if validated_token.get(CLAIMS_VERSION) != get_claims_version(validated_token[api_settings.USER_ID_CLAIM]):
+            return None
+
+        user = self.user_model(
+            id=validated_token[api_settings.USER_ID_CLAIM],
+            email=validated_token.get('email', ''),
+            is_active=True,
+            is_staff=validated_token.get('is_staff', False),
+            is_superuser=validated_token.get('is_superuser', False),
+        )
+        # объект соответствует существующей строке в БД, а не новому пользователю
+        user._state.adding = False
+        setattr(user, GROUPS_CACHE_ATTR, frozenset(validated_token.get('groups', [])))
+        return user
@@ -0,0 +1,135 @@
+'''
+Пакетное выполнение запросов к API (POST /api/batch/).
+
+Операции пакета выполняются по очереди внутри процесса теми же представлениями,
+что и обычные запросы, но без отдельного HTTP-запроса, middleware и повторного
+разбора JWT: пользователь, аутентифицированный для пакета, передается операциям готовым.
+Операции читают из основной БД и видят изменения предыдущих операций пакета.
+В режиме atomic все операции выполняются в одной транзакции: первая операция
+с кодом ответа 400 и выше откатывает ее, оставшиеся не выполняются (код 424).
+Ответы не в JSON (файлы, PDF) не передаются, возвращается только их код.
+'''
+import io
+import logging
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+from .fast_json import dumps, loads
+from .metrics import REQUEST_LATENCY
+from .view_actions import get_view_action
+
+logger = logging.getLogger(__name__)
+
+# описывают тело и адрес самого пакета, у операций они свои
+REQUEST_META_EXCLUDED = {
+    'REQUEST_METHOD', 'PATH_INFO', 'QUERY_STRING', 'CONTENT_TYPE', 'CONTENT_LENGTH',
+    'HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING', 'wsgi.input',
+}
+
+
+def build_request(request, operation):
+    '''
+    Django-запрос операции с заголовками пакета и уже аутентифицированным пользователем
+    '''
+    url = urlsplit(operation['path'])
+    body = dumps(operation['body']) if 'body' in operation else b''
+    environ = {key: value for key, value in request.META.items() if key not in REQUEST_META_EXCLUDED}
+    environ.update({
+        'REQUEST_METHOD': operation['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    if body:
+        environ['CONTENT_TYPE'] = 'application/json'
+    # под ASGI в META нет схемы, а она нужна для построения абсолютных ссылок
+    environ.setdefault('wsgi.url_scheme', request.scheme)
+
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    if request.user.is_authenticated:
+        # DRF использует этого пользователя вместо аутентификации по заголовку Authorization
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def response_body(response):
+    if response.streaming:
+        # содержимое не читается; response.close() не вызываем: он отправляет сигнал
+        # request_finished, который закрыл бы соединение с БД посреди транзакции пакета
+        for closer in response._resource_closers:
+            closer()
+        return None
+    if hasattr(response, 'data'):
+        return response.data
+    if response.get('Content-Type', '').startswith('application/json') and response.content:
+        return loads(response.content)
+    return None
+
+
+def operation_result(operation, status_code, body):
+    result = {'status': status_code, 'body': body}
+    if 'id' in operation:
+        result = {'id': operation['id'], **result}
+    return result
+
+
+def run_operation(request, operation):
+    sub_request = build_request(request, operation)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return operation_result(operation, status.HTTP_404_NOT_FOUND, {'detail': 'Маршрут не найден.'})
+
+    view_cls, action = get_view_action(sub_request, match.func)
+    # асинхронные обертки (вход, регистрация) и представления не из API пакет не вызывает
+    if view_cls is None or not getattr(view_cls, 'batchable', True) or iscoroutinefunction(match.func):
+        return operation_result(operation, status.HTTP_400_BAD_REQUEST, {'detail': 'Этот запрос нельзя выполнить в пакете.'})
+
+    started = time.perf_counter()
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        result = operation_result(operation, response.status_code, response_body(response))
+    except Exception:
+        logger.exception('Ошибка операции пакета %s %s', operation['method'], operation['path'])
+        result = operation_result(operation, status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'Внутренняя ошибка сервера.'})
+    # операции пакета видны в метриках наравне с обычными запросами к тем же представлениям
+    REQUEST_LATENCY.observe(
+        time.perf_counter() - started,
+        view=view_cls.__name__, action=action, method=operation['method'], status=result['status'])
+    return result
+
+
+def execute_batch(request, operations, atomic=False):
+    '''
+    Выполняет операции и возвращает (результаты, была ли успешная запись)
+    '''
+    results = []
+    wrote = False
+    if not atomic:
+        for operation in operations:
+            result = run_operation(request, operation)
+            results.append(result)
+            wrote = wrote or (operation['method'] not in SAFE_METHODS and result['status'] < 400)
+        return results, wrote
+
+    with transaction.atomic():
+        for operation in operations:
+            if results and results[-1]['status'] >= 400:
+                results.append(operation_result(operation, status.HTTP_424_FAILED_DEPENDENCY, {'detail': 'Не выполнено: предыдущая операция завершилась ошибкой.'}))
+                continue
+            results.append(run_operation(request, operation))
+        failed = any(result['status'] >= 400 for result in results)
+        if failed:
+            transaction.set_rollback(True)
+    writes = any(operation['method'] not in SAFE_METHODS for operation in operations)
+    return results, writes and not failed
@@ -0,0 +1,114 @@
+import asyncio
+import math
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, pct):
+    '''
+    Перцентиль по методу ближайшего ранга
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(durations, elapsed):
+    '''
+    Сводка по списку длительностей (в секундах): пропускная способность и перцентили в мс
+    '''
+    return {
+        'requests': len(durations),
+        'rps': round(len(durations) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(durations, 50) * 1000, 2),
+        'p95_ms': round(percentile(durations, 95) * 1000, 2),
+        'p99_ms': round(percentile(durations, 99) * 1000, 2),
+    }
+
+
+def run_timed(func, repeat):
+    '''
+    Вызывает func repeat раз подряд и возвращает сводку summarize
+    '''
+    durations = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        call_started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - call_started)
+    return summarize(durations, time.perf_counter() - started)
+
+
+async def http_request(method, url, headers=None, body=b'', unix_socket=None):
+    '''
+    Минимальный HTTP/1.1 клиент на asyncio (одно соединение на запрос).
+    Позволяет держать сотни одновременных соединений и ходить в unix-сокет gunicorn.
+    Возвращает (статус, заголовки, тело)
+    '''
+    parts = urlsplit(url)
+    if unix_socket:
+        reader, writer = await asyncio.open_unix_connection(unix_socket)
+    else:
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc or "localhost"}', 'Connection: close', f'Content-Length: {len(body)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + body)
+    try:
+        await writer.drain()
+        raw = await reader.read()
+    finally:
+        writer.close()
+
+    head, _, content = raw.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    if response_headers.get('transfer-encoding') == 'chunked':
+        content = _dechunk(content)
+    return int(status_line.split()[1]), response_headers, content
+
+
+def _dechunk(content):
+    body = bytearray()
+    while content:
+        size_line, _, content = content.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if not size:
+            break
+        body += content[:size]
+        content = content[size + 2:]
+    return bytes(body)
+
+
+async def http_load(method, url, concurrency, requests, headers=None, body=b'', unix_socket=None):
+    '''
+    Выполняет requests запросов, держа concurrency одновременных соединений.
+    Возвращает сводку summarize, а также количество ответов по статусам и ошибок соединения
+    '''
+    durations, statuses, errors = [], {}, 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                status, _, _ = await http_request(method, url, headers, body, unix_socket)
+            except OSError:
+                errors += 1
+                continue
+            durations.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result = summarize(durations, time.perf_counter() - started)
+    result.update(statuses=statuses, errors=errors)
+    return result
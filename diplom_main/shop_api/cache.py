@@ -0,0 +1,104 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GROUPS_VERSION_KEY = 'user_groups:version'
+GROUPS_CACHE_ATTR = '_cached_group_names'
+
+
+def _groups_version():
+    return cache.get_or_set(GROUPS_VERSION_KEY, time.time_ns, None)
+
+
+def _groups_key(user_id, version=None):
+    if version is None:
+        version = _groups_version()
+    return f'user_groups:{version}:{user_id}'
+
+
+def _claims_key(user_id):
+    return f'user_claims:{user_id}'
+
+
+def get_claims_version(user_id):
+    '''
+    Версия прав пользователя для claims токена (см. ClaimsJWTAuthentication).
+    Меняется при изменении групп пользователя, переименовании/удалении групп и сохранении
+    пользователя (is_staff, is_active), после чего claims выданных токенов не принимаются
+    '''
+    key = _claims_key(user_id)
+    versions = cache.get_many([GROUPS_VERSION_KEY, key])
+    groups_version = versions.get(GROUPS_VERSION_KEY) or _groups_version()
+    user_version = versions.get(key) or cache.get_or_set(key, time.time_ns, None)
+    return f'{groups_version}.{user_version}'
+
+
+def get_user_group_names(user):
+    '''
+    Возвращает множество названий групп пользователя.
+    Результат запоминается на объекте пользователя (в пределах запроса)
+    и в кэше django (между запросами), поэтому запрос к БД выполняется
+    только после изменения состава групп
+    '''
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    group_names = getattr(user, GROUPS_CACHE_ATTR, None)
+    if group_names is not None:
+        return group_names
+
+    key = _groups_key(user.pk)
+    group_names = cache.get(key)
+    if group_names is None:
+        group_names = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, group_names, settings.GROUPS_CACHE_TIMEOUT)
+
+    setattr(user, GROUPS_CACHE_ATTR, group_names)
+    return group_names
+
+
+def cache_user_groups(user_ids):
+    '''
+    Заполняет кэш групп для нескольких пользователей одним запросом к БД (прогрев, см. shop_api.warmup)
+    '''
+    from django.contrib.auth import get_user_model
+
+    user_ids = list(user_ids)
+    group_names = {user_id: set() for user_id in user_ids}
+    memberships = get_user_model().groups.through.objects.filter(user_id__in=user_ids).values_list('user_id', 'group__name')
+    for user_id, group_name in memberships:
+        group_names[user_id].add(group_name)
+
+    version = _groups_version()
+    cache.set_many({_groups_key(user_id, version): frozenset(names) for user_id, names in group_names.items()}, settings.GROUPS_CACHE_TIMEOUT)
+    return len(group_names)
+
+
+def user_in_groups(user, groups):
+    return not get_user_group_names(user).isdisjoint(groups)
+
+
+def invalidate_user_groups(*user_ids):
+    '''
+    Сбрасывает кэш групп для указанных пользователей
+    '''
+    cache.delete_many([_groups_key(user_id) for user_id in user_ids])
+    invalidate_user_claims(*user_ids)
+
+
+def invalidate_user_claims(*user_ids):
+    '''
+    Меняет версию прав пользователей: новая версия создается при следующем обращении
+    '''
+    cache.delete_many([_claims_key(user_id) for user_id in user_ids])
+
+
+def invalidate_all_groups():
+    '''
+    Сбрасывает кэш групп для всех пользователей (переименование/удаление группы)
+    '''
+    try:
+        cache.incr(GROUPS_VERSION_KEY)
+    except ValueError:
+        cache.set(GROUPS_VERSION_KEY, time.time_ns(), None)
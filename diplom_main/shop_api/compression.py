@@ -0,0 +1,129 @@
+'''
+Сжатие ответов brotli и gzip (см. CompressionMiddleware).
+
+Кодировка выбирается по заголовку Accept-Encoding с учетом q; при равных q
+предпочтение отдается brotli - он сжимает JSON плотнее при сопоставимых затратах CPU.
+Уровни сжатия: COMPRESSION_BROTLI_QUALITY и COMPRESSION_GZIP_LEVEL,
+замер размера и времени на разных уровнях: python manage.py bench_compression
+'''
+import time
+import zlib
+
+import brotli
+from django.conf import settings
+
+from .metrics import COMPRESSION_BYTES, COMPRESSION_DURATION
+
+ENCODINGS = ('br', 'gzip')
+STREAM_FLUSH_SIZE = 16 * 1024
+
+# HTML не сжимаем: в страницах админки и браузерного API есть CSRF-токен (атака BREACH)
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'text/csv', 'text/plain', 'text/css', 'text/xml', 'text/javascript',
+}
+
+
+def choose_encoding(accept_encoding):
+    '''
+    Поддерживаемая кодировка с наибольшим q из Accept-Encoding; None - сжимать нельзя
+    '''
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES and response.status_code not in (204, 206, 304)
+
+
+def make_compressor(encoding, level=None):
+    '''
+    Потоковый компрессор: (сжать порцию, сбросить буфер, завершить поток)
+    '''
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY if level is None else level)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 - формат gzip (заголовок и контрольная сумма)
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress(content, encoding, level=None):
+    started = time.perf_counter()
+    if encoding == 'br':
+        compressed = brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY if level is None else level)
+    else:
+        process, _, finish = make_compressor(encoding, level)
+        compressed = process(content) + finish()
+    COMPRESSION_DURATION.observe(time.perf_counter() - started, encoding=encoding)
+    return compressed
+
+
+class StreamCompressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self._process, self._flush, self._finish = make_compressor(encoding)
+        self._pending = 0
+        self._original = 0
+        self._compressed = 0
+
+    def process(self, chunk):
+        data = self._process(chunk)
+        self._pending += len(chunk)
+        if self._pending >= STREAM_FLUSH_SIZE:
+            data += self._flush()
+            self._original += self._pending
+            self._pending = 0
+        self._compressed += len(data)
+        return data
+
+    def finish(self):
+        data = self._finish()
+        # метрики обновляются один раз на ответ, а не на каждую порцию
+        COMPRESSION_BYTES.inc(self._original + self._pending, encoding=self.encoding, stage='original')
+        COMPRESSION_BYTES.inc(self._compressed + len(data), encoding=self.encoding, stage='compressed')
+        return data
+
+
+def compress_stream(chunks, encoding):
+    '''
+    Сжатие потокового ответа. Буфер компрессора сбрасывается каждые STREAM_FLUSH_SIZE байт
+    исходных данных: клиент получает данные по мере формирования, а мелкие порции
+    (например, строки CSV) не портят степень сжатия
+    '''
+    stream = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = stream.process(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    stream = StreamCompressor(encoding)
+    async for chunk in chunks:
+        data = stream.process(chunk)
+        if data:
+            yield data
+    yield stream.finish()
@@ -0,0 +1,20 @@
+from django.db import connections
+
+
+def get_connection_stats(alias):
+    '''
+    Состояние соединений текущего процесса с БД alias:
+    статистика psycopg_pool, если включен пул, иначе параметры постоянного соединения
+    '''
+    connection = connections[alias]
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        return {'mode': 'pool', **pool.get_stats()}
+
+    conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+    return {
+        'mode': 'persistent' if conn_max_age else 'per_request',
+        'conn_max_age': conn_max_age,
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'connected': connection.connection is not None,
+    }
@@ -0,0 +1,104 @@
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+DEFAULT_DB = 'default'
+
+REPLICA_PIN_COOKIE = 'replica_pin'
+REPLICA_PIN_SALT = 'shop_api.db_routers.replica_pin'
+
+# запрос, чтения которого можно отправлять на реплики (выставляет ReplicaRoutingMiddleware)
+replica_read_request = contextvars.ContextVar('replica_read_request', default=None)
+
+_replica_health = {}
+
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+
+def replica_aliases():
+    return settings.REPLICA_ALIASES
+
+
+def get_replica_lag(alias):
+    '''
+    Отставание реплики в секундах или None, если реплика недоступна
+    '''
+    connection = connections[alias]
+    try:
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            return float(cursor.fetchone()[0] or 0)
+    except DatabaseError:
+        return None
+
+
+def replica_is_healthy(alias):
+    '''
+    Реплика доступна и отстает не больше REPLICA_MAX_LAG.
+    Результат проверки кэшируется в процессе на REPLICA_LAG_CHECK_INTERVAL секунд
+    '''
+    checked_at, healthy = _replica_health.get(alias, (None, False))
+    now = time.monotonic()
+    if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+        lag = get_replica_lag(alias)
+        healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+        _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+def pin_to_primary(response):
+    '''
+    После записи клиент некоторое время читает с основной БД, чтобы видеть свои изменения.
+    Закрепление хранится в подписанной cookie, а не в кэше процесса, поэтому действует
+    на всех воркерах и серверах. Клиенты без cookie читают с реплик сразу после записи
+    '''
+    response.set_signed_cookie(
+        REPLICA_PIN_COOKIE, '1', salt=REPLICA_PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+    )
+
+
+def is_pinned_to_primary(request):
+    # подпись с истекшим max_age или подделанная cookie закрепления не дают
+    pin = request.get_signed_cookie(REPLICA_PIN_COOKIE, default=None, salt=REPLICA_PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS)
+    return pin is not None
+
+
+class ReplicaRouter:
+    '''
+    Отправляет чтения безопасных запросов к помеченным представлениям на реплику.
+    Все остальное (записи, фоновые команды, прочие представления) идет в default
+    '''
+    def db_for_read(self, model, **hints):
+        request = replica_read_request.get()
+        if request is None:
+            return None
+
+        # реплику выбираем один раз на запрос, чтобы все чтения видели одно состояние БД
+        if not hasattr(request, '_replica_alias'):
+            alias = None
+            if not is_pinned_to_primary(request):
+                healthy = [alias for alias in replica_aliases() if replica_is_healthy(alias)]
+                alias = random.choice(healthy) if healthy else None
+            request._replica_alias = alias
+        return request._replica_alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии default, поэтому связи между объектами из разных алиасов допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB
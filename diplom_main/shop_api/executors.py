@@ -0,0 +1,70 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис перегружен, повторите попытку позже.'
+    default_code = 'overloaded'
+
+
+class BoundedExecutor:
+    '''
+    Пул потоков с ограниченной очередью.
+    Если заняты все потоки и очередь заполнена, новая задача сразу отклоняется
+    с ServiceOverloaded, а не ждет освобождения пула
+    '''
+    def __init__(self, max_workers, max_queue, name):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceOverloaded()
+        try:
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._run, fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def arun(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @staticmethod
+    def _run(fn, *args, **kwargs):
+        # поток пула живет дольше запроса, поэтому соединения с БД закрываем как в начале/конце запроса
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+
+_auth_executor = None
+_auth_executor_lock = threading.Lock()
+
+
+def get_auth_executor():
+    '''
+    Пул для хеширования паролей (вход, регистрация, смена пароля).
+    PBKDF2 из hashlib отпускает GIL, поэтому потоки хешируют параллельно
+    '''
+    global _auth_executor
+    if _auth_executor is None:
+        with _auth_executor_lock:
+            if _auth_executor is None:
+                _auth_executor = BoundedExecutor(settings.AUTH_POOL_WORKERS, settings.AUTH_POOL_QUEUE, 'auth')
+    return _auth_executor
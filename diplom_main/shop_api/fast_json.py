@@ -0,0 +1,91 @@
+'''
+Быстрые JSON-рендерер и парсер для DRF.
+
+Кодирование и разбор выполняет orjson (requirements.txt). Без него FastJSONRenderer
+и FastJSONParser работают как JSONRenderer и JSONParser DRF: стандартный json не быстрее их.
+dumps и loads (пакет запросов) без orjson используют стандартный json.
+Вывод совпадает с rest_framework.renderers.JSONRenderer: datetime, Decimal и прочие
+нестандартные типы кодирует тот же rest_framework.utils.encoders.JSONEncoder
+(datetime в UTC - с суффиксом Z, Decimal вне сериализатора - числом),
+\\u2028 и \\u2029 экранируются. Отличия orjson: NaN и бесконечность выводятся как null,
+а не ошибкой, короче записываются очень большие и малые float (1e16 вместо 1e+16),
+смещения часовых поясов с секундами (исторические LMT) округляются до минут.
+Форматированный вывод (indent, браузерный API) и нестандартные настройки
+UNICODE_JSON/COMPACT_JSON/STRICT_JSON отдаются DRF.
+'''
+import codecs
+import decimal
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# datetime orjson кодирует сам: с OPT_UTC_Z вывод совпадает с JSONEncoder
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson else 0
+
+_encoder = JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def _escape_line_separators(content):
+    # строки JSON должны оставаться корректным JavaScript
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+def _default(obj):
+    # Decimal встречается чаще остальных типов, поэтому проверяется до общего JSONEncoder.default
+    if type(obj) is decimal.Decimal:
+        return float(obj)
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    '''
+    Компактный JSON в UTF-8, совпадающий с выводом JSONRenderer DRF
+    '''
+    if orjson is not None:
+        try:
+            return _escape_line_separators(orjson.dumps(data, default=_default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            # например, целые больше 64 бит: их кодирует стандартный json
+            pass
+    return _escape_line_separators(_encoder.encode(data).encode())
+
+
+def loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact or not self.strict or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,229 @@
+'''
+Быстрая сериализация для чтения списков.
+
+FastSerializer "компилирует" DRF-сериализатор: по его полям один раз строится список
+(имя, столбец, преобразование), а данные берутся из queryset.values() без создания
+моделей и без прохода каждого значения через Field.to_representation. Decimal и datetime
+форматируются так же, как в DecimalField и DateTimeField, поэтому JSON совпадает
+с ответом DRF-сериализатора побайтно (проверяется в shop_api/tests/test_fast_serializers.py).
+
+Связи many-to-many (вложенный сериализатор many=True или список pk) загружаются
+одним запросом на связь и упорядочены по pk связанного объекта.
+'''
+import decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .serializers import CategorySerializer, ItemSerializer, OrderSerializer
+from .sparse_fields import SparseFieldsMixin, requested_expand, requested_fields, validate_requested_fields
+
+# значения этих полей из values() уже имеют вид, который вернул бы to_representation
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField, PrimaryKeyRelatedField)
+
+# сколько сериализаторов для разных наборов ?fields= запоминает FastSerializer.only
+MAX_SUBSETS = 128
+
+
+def decimal_converter(field):
+    if getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) is False or field.localize or field.normalize_output:
+        return field.to_representation
+    if field.decimal_places is None:
+        return lambda value: format(value, 'f')
+
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return format(value.quantize(exponent, rounding=rounding, context=context), 'f')
+    return convert
+
+
+def datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        # наивные datetime и строки обрабатывает DRF
+        if not isinstance(value, str) and value.tzinfo is not None:
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return field.to_representation(value)
+    return convert
+
+
+def get_converter(field):
+    '''
+    Функция преобразования значения из values(); None - значение выводится как есть
+    '''
+    if isinstance(field, PLAIN_FIELDS):
+        return None
+    if isinstance(field, serializers.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return datetime_converter(field)
+    return field.to_representation
+
+
+class ManyToManyLoader:
+    '''
+    Загрузка связанных объектов для списка pk: {pk: [значение, ...]}
+    '''
+    def __init__(self, model, source, nested=None):
+        model_field = model._meta.get_field(source)
+        if not model_field.many_to_many:
+            raise ImproperlyConfigured(f'{model.__name__}.{source}: поддерживаются только связи many-to-many')
+        if isinstance(model_field, models.ManyToManyField):
+            self.through = model_field.remote_field.through
+            self.source_column, self.target_column = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+        else:
+            self.through = model_field.through
+            self.source_column, self.target_column = model_field.field.m2m_reverse_field_name(), model_field.field.m2m_field_name()
+        self.nested = nested
+
+    def queryset(self, pks):
+        # один запрос к промежуточной таблице; поля вложенного сериализатора - через join
+        lookups = [f'{self.target_column}__{column}' for column in self.nested.columns] if self.nested else [self.target_column]
+        return self.through.objects.filter(**{f'{self.source_column}__in': pks}).order_by(self.target_column).values_list(self.source_column, *lookups)
+
+    def collect(self, pks, rows):
+        related = {pk: [] for pk in pks}
+        if self.nested is None:
+            for parent, value in rows:
+                related[parent].append(value)
+            return related
+
+        nested_rows = [dict(zip(self.nested.columns, row[1:])) for row in rows]
+        for row, data in zip(rows, self.nested.format_rows(nested_rows)):
+            related[row[0]].append(data)
+        return related
+
+    def load(self, pks):
+        return self.collect(pks, list(self.queryset(pks)) if pks else [])
+
+    async def aload(self, pks):
+        return self.collect(pks, [row async for row in self.queryset(pks)] if pks else [])
+
+
+class FastSerializer:
+    '''
+    Сериализатор только для чтения, построенный по полям DRF-сериализатора
+    '''
+    def __init__(self, serializer_class, names=None):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.pk_column = self.model._meta.pk.name
+        self.fields = []
+        self.relations = {}
+        self._subsets = {}
+
+        for field in serializer_class().fields.values():
+            if field.write_only or (names is not None and field.field_name not in names):
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{field.field_name}: source {field.source} не поддерживается')
+
+            if isinstance(field, serializers.ListSerializer):
+                self.relations[field.field_name] = ManyToManyLoader(self.model, field.source, FastSerializer(type(field.child)))
+            elif isinstance(field, ManyRelatedField):
+                self.relations[field.field_name] = ManyToManyLoader(self.model, field.source)
+            self.fields.append((field.field_name, field.source, field))
+
+        self.columns = [source for name, source, field in self.fields if name not in self.relations]
+        # без столбцов values() вернул бы все поля модели
+        if (self.relations or not self.columns) and self.pk_column not in self.columns:
+            self.columns.append(self.pk_column)
+
+    def only(self, names):
+        '''
+        Сериализатор с частью полей (?fields=); построенные сериализаторы запоминаются
+        '''
+        key = frozenset(names)
+        subset = self._subsets.get(key)
+        if subset is None:
+            subset = FastSerializer(self.serializer_class, key)
+            # набор полей задает клиент, поэтому кэш ограничен
+            if len(self._subsets) < MAX_SUBSETS:
+                self._subsets[key] = subset
+        return subset
+
+    def values(self, queryset):
+        # prefetch_related для моделей здесь не нужен, связи загружает ManyToManyLoader
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def load_relations(self, rows):
+        if not self.relations:
+            return {}
+        pks = [row[self.pk_column] for row in rows]
+        return {name: loader.load(pks) for name, loader in self.relations.items()}
+
+    def format_rows(self, rows, relations=None):
+        # преобразования зависят от текущего часового пояса, поэтому строятся на каждый вызов
+        plan = [(name, source, name in self.relations, get_converter(field)) for name, source, field in self.fields]
+        relations = relations or {}
+        pk_column = self.pk_column
+
+        result = []
+        for row in rows:
+            data = {}
+            for name, source, is_relation, convert in plan:
+                if is_relation:
+                    data[name] = relations[name][row[pk_column]]
+                    continue
+                value = row[source]
+                data[name] = convert(value) if convert is not None and value is not None else value
+            result.append(data)
+        return result
+
+    def serialize_rows(self, rows):
+        return self.format_rows(rows, self.load_relations(rows))
+
+    def serialize(self, queryset):
+        return self.serialize_rows(list(self.values(queryset)))
+
+    async def aserialize(self, queryset):
+        rows = [row async for row in self.values(queryset)]
+        pks = [row[self.pk_column] for row in rows] if self.relations else []
+        relations = {name: await loader.aload(pks) for name, loader in self.relations.items()}
+        return self.format_rows(rows, relations)
+
+
+fast_item_serializer = FastSerializer(ItemSerializer)
+fast_category_serializer = FastSerializer(CategorySerializer)
+fast_order_serializer = FastSerializer(OrderSerializer)
+
+
+class FastListMixin:
+    '''
+    list() через FastSerializer; сериализатор задается атрибутом fast_serializer представления.
+    Поддерживает ?fields=; раскрытие связей (?expand=) выполняет DRF-сериализатор
+    '''
+    fast_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        fast_serializer = self.fast_serializer
+        if issubclass(self.serializer_class, SparseFieldsMixin):
+            if requested_expand(request) & set(self.serializer_class.expandable_fields):
+                return super().list(request, *args, **kwargs)
+            names = requested_fields(request)
+            if names is not None:
+                validate_requested_fields(names, [name for name, source, field in fast_serializer.fields], self.serializer_class.expandable_fields)
+                fast_serializer = fast_serializer.only(names)
+
+        queryset = fast_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast_serializer.serialize_rows(page))
+        return Response(fast_serializer.serialize_rows(list(queryset)))
@@ -0,0 +1,124 @@
+'''
+Учет запросов к БД по запросам API.
+
+QueryInstrumentationMiddleware считает количество запросов, суммарное время
+и самый медленный SQL для каждого запроса и складывает их в query_report
+по ключу "Представление.действие". В режиме DEBUG те же данные отдаются
+в заголовках X-DB-*.
+
+Представление может объявить бюджеты запросов для своих действий:
+
+    class ItemView(ModelViewSet):
+        query_budgets = {'list': 3, 'add_to_basket': 12}
+
+При QUERY_BUDGETS_ENFORCE = True (например, override_settings в тестах)
+превышение бюджета приводит к QueryBudgetExceeded, иначе пишется предупреждение в лог.
+'''
+import contextvars
+import logging
+import threading
+import time
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+current_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.label = None
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.total_time += duration
+        if duration >= self.slowest_time:
+            self.slowest_time, self.slowest_sql = duration, sql
+
+
+def instrumented_execute(execute, sql, params, many, context):
+    '''
+    Execute wrapper, установленный на все соединения. Пока в контексте нет
+    активного QueryRecorder, просто вызывает execute
+    '''
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.record(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    if instrumented_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrumented_execute)
+
+
+class QueryReport:
+    '''
+    Агрегированная статистика запросов к БД по представлениям в памяти процесса
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, recorder):
+        with self._lock:
+            stats = self._stats.setdefault(recorder.label, {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_time_ms': 0.0,
+                'slowest_ms': 0.0,
+                'slowest_sql': None,
+            })
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['db_time_ms'] += recorder.total_time * 1000
+            if recorder.slowest_time * 1000 >= stats['slowest_ms']:
+                stats['slowest_ms'] = recorder.slowest_time * 1000
+                stats['slowest_sql'] = recorder.slowest_sql
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                label: {
+                    **stats,
+                    'avg_queries': round(stats['queries'] / stats['requests'], 2),
+                    'db_time_ms': round(stats['db_time_ms'], 2),
+                    'slowest_ms': round(stats['slowest_ms'], 2),
+                }
+                for label, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_report = QueryReport()
+
+
+def check_query_budget(view_cls, action, recorder, enforce):
+    budget = getattr(view_cls, 'query_budgets', {}).get(action)
+    if budget is None or recorder.count <= budget:
+        return
+    message = f'{recorder.label}: {recorder.count} запросов к БД при бюджете {budget}'
+    if enforce:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
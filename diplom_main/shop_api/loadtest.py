@@ -0,0 +1,267 @@
+'''
+Сценарии нагрузочного тестирования API (см. manage.py loadtest).
+
+Сценарий - функция, выполняющая одну итерацию пользовательского пути через send().
+Запросы идут либо в текущий процесс через django.test.Client, либо по HTTP в запущенный
+сервер. Данные для сценариев (товары, адреса, корзины) берутся из БД через ORM,
+поэтому при запуске против сервера команда должна смотреть в ту же БД.
+'''
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from .bench import http_request, summarize
+from .models import Address, Category, Item, Order
+
+User = get_user_model()
+
+
+class InProcessTransport:
+    '''
+    Запросы в текущий процесс; у каждого потока свой Client
+    '''
+    def __init__(self):
+        self._local = threading.local()
+
+    def send(self, method, path, body, content_type, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(raise_request_exception=False)
+        response = client.generic(method, path, body, content_type=content_type, headers=headers)
+        # количество запросов к БД считает QueryInstrumentationMiddleware
+        recorder = getattr(response.wsgi_request, '_query_recorder', None)
+        return response.status_code, response.content, recorder.count if recorder else None
+
+
+class HttpTransport:
+    '''
+    Запросы по HTTP в запущенный сервер. Количество запросов к БД известно,
+    только если сервер работает с DEBUG = True (заголовок X-DB-Query-Count)
+    '''
+    def __init__(self, base_url, unix_socket=None):
+        self.base_url = base_url.rstrip('/')
+        self.unix_socket = unix_socket
+
+    def send(self, method, path, body, content_type, headers):
+        headers = {**headers, 'Content-Type': content_type}
+        status, response_headers, content = asyncio.run(
+            http_request(method, self.base_url + path, headers, body, self.unix_socket))
+        queries = response_headers.get('x-db-query-count')
+        return status, content, int(queries) if queries else None
+
+
+class ScenarioStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = []
+        self.queries = []
+        self.statuses = {}
+        self.errors = 0
+        self.iterations = 0
+
+    def add(self, duration, status, queries):
+        with self._lock:
+            self.durations.append(duration)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status >= 400:
+                self.errors += 1
+            if queries is not None:
+                self.queries.append(queries)
+
+    def summary(self, elapsed):
+        result = summarize(self.durations, elapsed)
+        result.update(
+            iterations=self.iterations,
+            errors=self.errors,
+            statuses={str(status): count for status, count in sorted(self.statuses.items())},
+            avg_queries=round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+            max_queries=max(self.queries) if self.queries else None,
+        )
+        return result
+
+
+class Session:
+    '''
+    Отправка запросов от имени пользователя с учетом статистики сценария
+    '''
+    def __init__(self, transport, stats, token=None):
+        self.transport = transport
+        self.stats = stats
+        self.token = token
+
+    def send(self, method, path, data=None, files=None):
+        if files is not None:
+            body, content_type = encode_multipart(BOUNDARY, {**(data or {}), **files}), MULTIPART_CONTENT
+        else:
+            body, content_type = (json.dumps(data).encode() if data is not None else b''), 'application/json'
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+        started = time.perf_counter()
+        status, content, queries = self.transport.send(method, path, body, content_type, headers)
+        self.stats.add(time.perf_counter() - started, status, queries)
+        return status, content
+
+
+class LoadTestContext:
+    '''
+    Данные, общие для всех сценариев: токены пользователей и идентификаторы объектов
+    '''
+    def __init__(self, transport, workers, password, seed):
+        self.transport = transport
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+
+        self.customers = self.prepare_customers(workers)
+        self.customer_tokens = [self.get_token(customer.email, password) for customer in self.customers]
+        self.manager_token = self.get_token(self.find_user('manager_base').email, password)
+        self.vendor_token = self.get_token(self.find_user('vendor_base').email, password)
+
+        # самые "складские" товары, чтобы оформление заказов не упиралось в остатки
+        self.item_ids = list(Item.objects.filter(is_active=True, quantity__gt=0).order_by('-quantity').values_list('id', flat=True)[:1000])
+        self.category_ids = list(Category.objects.order_by('id').values_list('id', flat=True)[:1000])
+        self.warehouse_order_ids = list(Order.objects.exclude(state='basket').order_by('-id').values_list('id', flat=True)[:100])
+        if not self.item_ids or not self.category_ids:
+            raise ValueError('В БД нет товаров или категорий: заполните ее командой generate_data')
+
+        self._item_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.item_ids) + 1)))
+        self._category_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(self.category_ids) + 1)))
+        self._lock = threading.Lock()
+
+    def prepare_customers(self, workers):
+        # в первую очередь покупатели с заказами, иначе get_my_orders отвечает ошибкой
+        has_orders = Exists(Order.objects.filter(user=OuterRef('pk')).exclude(state='basket'))
+        customers = list(
+            User.objects.filter(is_active=True, is_staff=False, groups__isnull=True)
+            .annotate(has_orders=has_orders).order_by('-has_orders', 'id')[:workers])
+        if not customers:
+            raise ValueError('В БД нет активных покупателей: выполните initial_script или generate_data')
+        for customer in customers:
+            if not Address.objects.filter(user=customer).exists():
+                Address.objects.create(user=customer, city='Москва', street='Нагрузочная', house='1', appartment=customer.id)
+        self.address_ids = {customer.id: Address.objects.filter(user=customer).values_list('id', flat=True).first() for customer in customers}
+        return customers
+
+    @staticmethod
+    def find_user(group):
+        user = User.objects.filter(is_active=True, groups__name=group).order_by('id').first()
+        if user is None:
+            raise ValueError(f'В БД нет пользователя группы {group}: выполните initial_script')
+        return user
+
+    def get_token(self, email, password):
+        body = json.dumps({'email': email, 'password': password}).encode()
+        status, content, _ = self.transport.send('POST', '/api/token/', body, 'application/json', {})
+        if status != 200:
+            raise ValueError(f'Не удалось получить токен {email}: {status}')
+        return json.loads(content)['access']
+
+    def popular_item(self):
+        with self._lock:
+            return self.rng.choices(self.item_ids, cum_weights=self._item_weights)[0]
+
+    def popular_category(self):
+        with self._lock:
+            return self.rng.choices(self.category_ids, cum_weights=self._category_weights)[0]
+
+
+def browse(context, session, worker, iteration):
+    session.send('GET', f'/api/items//{context.popular_item()}/')
+    session.send('GET', f'/api/items//{context.popular_item()}/')
+    session.send('GET', f'/api/categories//{context.popular_category()}/')
+
+
+def search(context, session, worker, iteration):
+    ordering = ('price', '-price', '-updated_at')[iteration % 3]
+    session.send('GET', f'/api/items//?category={context.popular_category()}&ordering={ordering}')
+
+
+def my_orders(context, session, worker, iteration):
+    session.token = context.customer_tokens[worker % len(context.customer_tokens)]
+    session.send('GET', '/api/order//get_my_orders/')
+
+
+def add_to_basket(context, session, worker, iteration):
+    session.token = context.customer_tokens[worker % len(context.customer_tokens)]
+    session.send('POST', f'/api/items//{context.popular_item()}/add_to_basket/', {'quantity': 1})
+
+
+def checkout(context, session, worker, iteration):
+    # у каждого потока свой покупатель, поэтому корзины потоков не пересекаются
+    customer = context.customers[worker % len(context.customers)]
+    session.token = context.customer_tokens[worker % len(context.customer_tokens)]
+    session.send('POST', f'/api/items//{context.popular_item()}/add_to_basket/', {'quantity': 1})
+    basket_id = Order.objects.filter(user=customer, state='basket').values_list('id', flat=True).first()
+    if basket_id is not None:
+        session.send('PATCH', f'/api/order//{basket_id}/start_order/', {'address': context.address_ids[customer.id]})
+
+
+def warehouse(context, session, worker, iteration):
+    if not context.warehouse_order_ids:
+        return
+    session.token = context.manager_token
+    order_id = context.warehouse_order_ids[iteration % len(context.warehouse_order_ids)]
+    for action in ('order_collecting', 'order_collected', 'order_shipped'):
+        session.send('PATCH', f'/api/order//{order_id}/{action}/')
+
+
+def csv_upload(context, session, worker, iteration, rows=20):
+    session.token = context.vendor_token
+    lines = ['name;price;quantity;type_1;value_1;type_2;value_2']
+    lines += [f'Нагрузка {context.run_id}-{worker}-{iteration}-{row};{100 + row}.50;{10 + row};Цвет;Черный;Гарантия;12 мес.' for row in range(rows)]
+    content = '\n'.join(lines).encode()
+    session.send('POST', '/api/upload-csv/', files={'file': SimpleUploadedFile('items.csv', content, 'text/csv')})
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'my_orders': my_orders,
+    'add_to_basket': add_to_basket,
+    'checkout': checkout,
+    'warehouse': warehouse,
+    'csv_upload': csv_upload,
+}
+
+
+def run_scenario(context, name, iterations, concurrency):
+    '''
+    Выполняет iterations итераций сценария в concurrency потоках и возвращает сводку
+    '''
+    scenario = SCENARIOS[name]
+    stats = ScenarioStats()
+    counter = itertools.count()
+    counter_lock = threading.Lock()
+
+    def worker(index):
+        session = Session(context.transport, stats)
+        try:
+            while True:
+                with counter_lock:
+                    iteration = next(counter)
+                if iteration >= iterations:
+                    return
+                scenario(context, session, index, iteration)
+                with counter_lock:
+                    stats.iterations += 1
+        finally:
+            # соединения с БД, открытые в потоке (ORM сценариев, in-process запросы)
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(index,), name=f'loadtest-{name}-{index}') for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary(time.perf_counter() - started)
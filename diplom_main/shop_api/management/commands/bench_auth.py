@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from shop_api.authentication import ClaimsJWTAuthentication, get_tokens_for_user
+from shop_api.bench import run_timed
+
+User = get_user_model()
+
+AUTH_MODES = {
+    'db': JWTAuthentication,
+    'claims': ClaimsJWTAuthentication,
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнение запросов/с GET-эндпоинта с JWT-аутентификацией через БД и через claims токена'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/position//', help='GET-эндпоинт для замера')
+        parser.add_argument('--email', default='test_manager@diplom.com', help='Пользователь, от имени которого выполняются запросы')
+        parser.add_argument('--requests', type=int, default=500, help='Количество запросов в каждом режиме')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {options['email']} не найден. Запустите initial_script или укажите --email')
+
+        match = resolve(options['path'])
+        view_cls = match.func.cls
+        token = f'Bearer {get_tokens_for_user(user).access_token}'
+        factory = RequestFactory()
+
+        def call_view():
+            request = factory.get(options['path'], HTTP_AUTHORIZATION=token)
+            response = match.func(request, *match.args, **match.kwargs)
+            response.render()
+            if response.status_code != 200:
+                raise CommandError(f'{options['path']} вернул статус {response.status_code}')
+
+        for mode, auth_class in AUTH_MODES.items():
+            with mock.patch.object(view_cls, 'authentication_classes', [auth_class]):
+                call_view()  # прогрев
+                with CaptureQueriesContext(connection) as queries:
+                    call_view()
+                result = run_timed(call_view, options['requests'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{mode:>6}: {result['rps']} запросов/с, p50 {result['p50_ms']} мс, '
+                f'p99 {result['p99_ms']} мс, запросов к БД на вызов: {len(queries)}'))
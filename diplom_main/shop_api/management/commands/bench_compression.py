@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from shop_api.compression import compress
+
+LEVELS = {
+    'gzip': (1, 6, 9),
+    'br': (1, 4, 5, 6, 9, 11),
+}
+
+
+class Command(BaseCommand):
+    help = 'Размер и время сжатия ответов API brotli и gzip на разных уровнях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', nargs='+', default=['/api/items//', '/api/categories//'], help='GET-эндпоинты, ответы которых сжимаются')
+        parser.add_argument('--file', nargs='+', default=[], help='Файлы для сжатия (например, выгрузки)')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество замеров каждого уровня, берется лучший')
+
+    def handle(self, *args, **options):
+        payloads = []
+        client = Client()
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], COMPRESSION_ENABLED=False):
+            for path in options['path']:
+                response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError(f'{path} вернул статус {response.status_code}')
+                payloads.append((path, b''.join(response.streaming_content) if response.streaming else response.content))
+        for path in options['file']:
+            with open(path, 'rb') as file:
+                payloads.append((path, file.read()))
+
+        for name, content in payloads:
+            if not content:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {len(content)} байт'))
+            for encoding, levels in LEVELS.items():
+                current = settings.COMPRESSION_BROTLI_QUALITY if encoding == 'br' else settings.COMPRESSION_GZIP_LEVEL
+                for level in levels:
+                    best = float('inf')
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        compressed = compress(content, encoding, level)
+                        best = min(best, time.perf_counter() - started)
+                    mark = ' (текущий)' if level == current else ''
+                    self.stdout.write(
+                        f'  {encoding:<4} уровень {level:>2}: {len(compressed):>10} байт, {len(compressed) / len(content):6.1%}, '
+                        f'{best * 1000:8.2f} мс, {len(content) / best / 2 ** 20:8.1f} МБ/с{mark}')
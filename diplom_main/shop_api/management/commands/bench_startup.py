@@ -0,0 +1,93 @@
+import collections
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from .microbench import Command as MicrobenchCommand, DEFAULT_TOLERANCE
+
+# старт воркера: приложение WSGI и URLconf, который Django иначе загружает на первом запросе
+WSGI_STARTUP = 'import diplom_main.wsgi; from django.urls import get_resolver; get_resolver().url_patterns'
+
+# тяжелые зависимости, которые должны загружаться только при использовании (см. shop_api.utils)
+LAZY_MODULES = ('weasyprint', 'fontTools', 'pydyf', 'cssselect2', 'tinycss2')
+
+
+def startup_commands():
+    return {
+        'python': [sys.executable, '-c', 'pass'],
+        'wsgi': [sys.executable, '-c', WSGI_STARTUP],
+        'check': [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'check'],
+    }
+
+
+def run_process(command):
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=settings.BASE_DIR, env=os.environ, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode != 0:
+        raise CommandError(f'{' '.join(command)} завершился с кодом {process.returncode}:\n{process.stderr[-2000:]}')
+    return elapsed, process.stderr
+
+
+def parse_importtime(output):
+    '''
+    Собственное время импорта (мс) по пакетам верхнего уровня из вывода python -X importtime
+    '''
+    packages = collections.Counter()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1000
+    return packages
+
+
+class Command(MicrobenchCommand):
+    help = 'Время запуска интерпретатора, воркера WSGI и manage.py check с проверкой регрессий относительно baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', nargs='+', choices=startup_commands(), default=list(startup_commands()), help='Замеры для запуска')
+        parser.add_argument('--rounds', type=int, default=5, help='Количество запусков каждого процесса')
+        parser.add_argument('--top', type=int, default=15, help='Сколько самых медленных при импорте пакетов показать')
+        parser.add_argument('--save-baseline', default=None, help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline', default=None, help='Сравнить с результатами из JSON-файла')
+        parser.add_argument('--tolerance', type=float, default=None,
+                            help=f'Допустимое замедление в процентах (по умолчанию из baseline или {DEFAULT_TOLERANCE})')
+
+    def handle(self, *args, **options):
+        commands = startup_commands()
+        results = {}
+        for name in options['benchmark']:
+            # первый запуск прогревает кэш файловой системы и .pyc
+            run_process(commands[name])
+            timings = [run_process(commands[name])[0] * 1000 for _ in range(options['rounds'])]
+            result = results[name] = {
+                'median_ms': statistics.median(timings),
+                'min_ms': min(timings),
+                'stdev_ms': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+                'rounds': len(timings),
+            }
+            self.stdout.write(
+                f'{name:<22} медиана {result['median_ms']:>10.1f} мс, минимум {result['min_ms']:>10.1f} мс, '
+                f'разброс {result['stdev_ms']:.1f} мс, запусков: {result['rounds']}')
+
+        if 'wsgi' in options['benchmark']:
+            self.report_imports(options['top'])
+        self.check_baseline(results, options)
+
+    def report_imports(self, top):
+        _, output = run_process([sys.executable, '-X', 'importtime', '-c', WSGI_STARTUP])
+        packages = parse_importtime(output)
+
+        self.stdout.write(f'\nИмпорт при старте воркера: {sum(packages.values()):.1f} мс, самые медленные пакеты:')
+        for package, elapsed in packages.most_common(top):
+            self.stdout.write(f'  {package:<30} {elapsed:>8.1f} мс')
+
+        loaded = sorted(package for package in LAZY_MODULES if package in packages)
+        if loaded:
+            raise CommandError(f'При старте воркера загружаются модули, которые должны импортироваться по требованию: {', '.join(loaded)}')
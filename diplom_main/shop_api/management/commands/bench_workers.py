@@ -0,0 +1,146 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shop_api.bench import http_request, summarize
+
+MODES = {'preload': 'True', 'no-preload': 'False'}
+
+
+def read_memory(pid):
+    '''
+    RSS, PSS и USS (память, не разделяемая с другими процессами) в КиБ из /proc/<pid>/smaps_rollup
+    '''
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                values[name] = int(value.split()[0])
+    return {'rss': values['Rss'], 'pss': values['Pss'], 'uss': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as file:
+                stat = file.read()
+        except OSError:
+            continue
+        # после имени процесса в скобках идут состояние и pid родителя
+        if int(stat.rpartition(')')[2].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+class Command(BaseCommand):
+    help = 'Память воркеров gunicorn и время холодного старта с preload и без него (только Linux)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES), help='Режимы загрузки приложения')
+        parser.add_argument('--workers', type=int, default=3, help='Количество воркеров')
+        parser.add_argument('--worker-class', default='gthread', help='Класс воркеров gunicorn')
+        parser.add_argument('--url', default='/api/items//', help='GET-эндпоинт для запросов')
+        parser.add_argument('--requests', type=int, default=50, help='Количество запросов после старта')
+        parser.add_argument('--timeout', type=float, default=60, help='Ожидание запуска gunicorn, сек')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('Нужен Linux с /proc/<pid>/smaps_rollup')
+
+        results = {}
+        for mode in options['mode']:
+            results[mode] = result = self.measure(mode, options)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{mode}:'))
+            self.stdout.write(
+                f'  первый ответ через {result['ready_ms']:.0f} мс после запуска, все воркеры через {result['workers_ms']:.0f} мс')
+            self.stdout.write(
+                f'  первый запрос {result['first_ms']:.1f} мс, затем p50 {result['requests']['p50_ms']} мс, p95 {result['requests']['p95_ms']} мс')
+            self.stdout.write(
+                f'  мастер: RSS {result['master']['rss'] / 1024:.1f} МиБ, PSS {result['master']['pss'] / 1024:.1f} МиБ')
+            self.stdout.write(
+                f'  воркер (среднее): RSS {result['worker']['rss'] / 1024:.1f} МиБ, PSS {result['worker']['pss'] / 1024:.1f} МиБ, '
+                f'USS {result['worker']['uss'] / 1024:.1f} МиБ')
+            self.stdout.write(f'  всего PSS: {result['total_pss'] / 1024:.1f} МиБ')
+
+    def measure(self, mode, options):
+        config = settings.BASE_DIR.parent / 'gunicorn' / 'gunicorn.conf.py'
+        url = f'http://localhost{options['url']}'
+        with tempfile.TemporaryDirectory() as directory, open(os.path.join(directory, 'gunicorn.log'), 'w+') as log:
+            socket_path = os.path.join(directory, 'gunicorn.sock')
+            env = {
+                **os.environ,
+                'GUNICORN_BIND': f'unix:{socket_path}',
+                'GUNICORN_WORKERS': str(options['workers']),
+                'GUNICORN_WORKER_CLASS': options['worker_class'],
+                'GUNICORN_PRELOAD': MODES[mode],
+            }
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '--config', str(config)],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                ready_ms = self.wait_ready(process, url, socket_path, started, options['timeout'], log)
+                while len(child_pids(process.pid)) < options['workers']:
+                    if time.perf_counter() - started > options['timeout']:
+                        raise CommandError('Не дождались запуска всех воркеров')
+                    time.sleep(0.01)
+                workers_ms = (time.perf_counter() - started) * 1000
+
+                # первый запрос после старта попадает в воркер, еще не обслуживший ни одного запроса
+                first_ms = self.timed_get(url, socket_path) * 1000
+                durations = [self.timed_get(url, socket_path) for _ in range(options['requests'])]
+
+                master = read_memory(process.pid)
+                workers = [read_memory(pid) for pid in child_pids(process.pid)]
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+        return {
+            'ready_ms': ready_ms,
+            'workers_ms': workers_ms,
+            'first_ms': first_ms,
+            'requests': summarize(durations, sum(durations)),
+            'master': master,
+            'worker': {key: sum(worker[key] for worker in workers) / len(workers) for key in ('rss', 'pss', 'uss')},
+            'total_pss': master['pss'] + sum(worker['pss'] for worker in workers),
+        }
+
+    def wait_ready(self, process, url, socket_path, started, timeout, log):
+        while True:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'gunicorn завершился с кодом {process.returncode}:\n{log.read()[-2000:]}')
+            if time.perf_counter() - started > timeout:
+                raise CommandError('Не дождались ответа gunicorn')
+            try:
+                status, _, _ = asyncio.run(http_request('GET', url, unix_socket=socket_path))
+            except OSError:
+                time.sleep(0.01)
+                continue
+            if status != 200:
+                raise CommandError(f'{url} вернул статус {status}')
+            return (time.perf_counter() - started) * 1000
+
+    @staticmethod
+    def timed_get(url, socket_path):
+        started = time.perf_counter()
+        status, _, _ = asyncio.run(http_request('GET', url, unix_socket=socket_path))
+        if status != 200:
+            raise CommandError(f'{url} вернул статус {status}')
+        return time.perf_counter() - started
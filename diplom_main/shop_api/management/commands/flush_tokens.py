@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истекшие outstanding- и blacklisted-токены небольшими пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Сколько токенов удалять в одной транзакции')
+        parser.add_argument('--pause', type=float, default=0.1, help='Пауза между пачками, сек')
+        parser.add_argument('--interval', type=int, default=0, help='Повторять очистку каждые N секунд (0 - выполнить один раз)')
+
+    def handle(self, *args, **options):
+        while True:
+            self.flush(options['batch_size'], options['pause'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def flush(self, batch_size, pause):
+        started = time.monotonic()
+        now = timezone.now()
+        removed_outstanding, removed_blacklisted = 0, 0
+
+        while True:
+            ids = list(
+                OutstandingToken.objects
+                .filter(expires_at__lte=now)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            # каждая пачка в своей короткой транзакции, чтобы не держать блокировки на всю таблицу
+            with transaction.atomic():
+                _, deleted = OutstandingToken.objects.filter(pk__in=ids).delete()
+
+            removed_outstanding += deleted.get(OutstandingToken._meta.label, 0)
+            removed_blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено outstanding-токенов: {removed_outstanding}, blacklisted-токенов: {removed_blacklisted} '
+            f'за {time.monotonic() - started:.2f} с'))
@@ -0,0 +1,304 @@
+import datetime
+import io
+import itertools
+import math
+import random
+import string
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from shop_api.models import Address, Category, Item, ItemInfo, Order, OrderItem
+
+User = get_user_model()
+
+# доли состояний заказов; корзина - не больше одной на пользователя
+ORDER_STATES = {
+    'created': 0.08,
+    'collecting': 0.04,
+    'collected': 0.03,
+    'shipped': 0.08,
+    'delivered': 0.65,
+    'canceled': 0.12,
+}
+CLOSED_STATES = ('delivered', 'canceled')
+# фиксированная дата по умолчанию: с текущей датой одинаковое зерно давало бы разные данные в разные дни
+DEFAULT_END_DATE = '2025-12-31'
+
+ITEM_INFO = {
+    'Цвет': ['Черный', 'Белый', 'Серый', 'Красный', 'Синий', 'Зеленый'],
+    'Гарантия': ['6 мес.', '12 мес.', '24 мес.', '36 мес.'],
+    'Страна производства': ['Россия', 'Китай', 'Германия', 'Япония', 'Корея', 'Турция'],
+    'Материал': ['Пластик', 'Металл', 'Стекло', 'Дерево', 'Ткань'],
+    'Вес': ['0.2 кг', '0.5 кг', '1 кг', '2.5 кг', '5 кг', '12 кг'],
+}
+CITIES = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Екатеринбург', 'Казань', 'Нижний Новгород', 'Самара', 'Омск']
+STREETS = ['Ленина', 'Мира', 'Советская', 'Гагарина', 'Победы', 'Садовая', 'Лесная', 'Школьная', 'Новая', 'Заречная']
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Иван', 'Ольга', 'Павел', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков']
+
+
+def zipf_cum_weights(size, exponent):
+    '''
+    Накопленные веса распределения Ципфа для rng.choices: k-й по популярности элемент выбирается с весом 1 / k^exponent
+    '''
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = ('Генерирует большой детерминированный набор данных (пользователи, адреса, товары, категории, заказы) для нагрузочного тестирования. '
+            'id продолжают уже существующие, поэтому одинаковые данные получаются на БД в одинаковом исходном состоянии')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Количество покупателей')
+        parser.add_argument('--vendors', type=int, default=100, help='Количество поставщиков')
+        parser.add_argument('--items', type=int, default=100000, help='Количество товаров')
+        parser.add_argument('--categories', type=int, default=200, help='Количество категорий')
+        parser.add_argument('--orders', type=int, default=200000, help='Количество заказов (без корзин)')
+        parser.add_argument('--max-order-items', type=int, default=8, help='Максимальное количество позиций в заказе')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Показатель распределения популярности товаров')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора: одинаковые параметры дают одинаковые данные')
+        parser.add_argument('--end-date', default=DEFAULT_END_DATE, help=f'Дата последнего заказа YYYY-MM-DD (по умолчанию {DEFAULT_END_DATE}); заказы распределяются за год до нее')
+        parser.add_argument('--password', default='qwe', help='Пароль всех созданных пользователей')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Количество строк в одной пачке загрузки')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.end = self.parse_end_date(options['end_date'])
+        started = time.monotonic()
+
+        # идентификаторы задаются явно, чтобы связывать строки без чтения их обратно из БД
+        self.next_ids = {
+            model: (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+            for model in (User, Address, Item, ItemInfo, Category, Order, OrderItem, Category.items.through, User.groups.through)
+        }
+        self.counts = {}
+
+        with transaction.atomic():
+            vendor_ids = self.generate_users(options['vendors'], options['password'], vendors=True)
+            customer_ids = self.generate_users(options['users'], options['password'])
+            address_ids = self.generate_addresses(customer_ids)
+            item_prices = self.generate_items(options['items'], vendor_ids)
+            self.generate_categories(options['categories'], list(item_prices), options['zipf'])
+            self.generate_orders(options['orders'], customer_ids, address_ids, item_prices, options['max_order_items'], options['zipf'])
+
+        self.reset_sequences()
+
+        for model, count in self.counts.items():
+            self.stdout.write(f'{model._meta.db_table}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Данные сгенерированы за {time.monotonic() - started:.1f} с'))
+
+    def parse_end_date(self, value):
+        try:
+            day = datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError('Дата должна быть в формате YYYY-MM-DD')
+        return datetime.datetime.combine(day, datetime.time(23, 59), tzinfo=datetime.timezone.utc)
+
+    def take_ids(self, model, count):
+        first = self.next_ids[model]
+        self.next_ids[model] += count
+        return range(first, first + count)
+
+    def random_moment(self, days=365):
+        return self.end - datetime.timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def generate_users(self, count, password, vendors=False):
+        # один хеш на всех: хеширование миллиона паролей заняло бы часы; соль из генератора, чтобы хеш не менялся между запусками
+        password_hash = make_password(password, salt=''.join(self.rng.choices(string.ascii_letters + string.digits, k=22)))
+        ids = self.take_ids(User, count)
+        kind = 'vendor' if vendors else 'user'
+        self.load(User, ['id', 'email', 'first_name', 'last_name', 'password', 'date_joined', 'is_active', 'is_staff', 'is_superuser'], (
+            (user_id, f'gen-{kind}-{user_id}@example.com', self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+             password_hash, self.random_moment(730).date(), True, False, False)
+            for user_id in ids
+        ))
+
+        group = Group.objects.filter(name='vendor_base').first() if vendors else None
+        if group is not None:
+            self.load(User.groups.through, ['id', 'user_id', 'group_id'], (
+                (row_id, user_id, group.id)
+                for row_id, user_id in zip(self.take_ids(User.groups.through, count), ids)
+            ))
+        return list(ids)
+
+    def generate_addresses(self, customer_ids):
+        ids = self.take_ids(Address, len(customer_ids))
+        # номер квартиры равен id адреса, поэтому адреса уникальны
+        self.load(Address, ['id', 'user_id', 'city', 'street', 'house', 'building', 'floor', 'appartment'], (
+            (address_id, user_id, self.rng.choice(CITIES), self.rng.choice(STREETS), str(self.rng.randint(1, 150)),
+             None, self.rng.randint(1, 25), address_id)
+            for address_id, user_id in zip(ids, customer_ids)
+        ))
+        return dict(zip(customer_ids, ids))
+
+    def generate_items(self, count, vendor_ids):
+        if not vendor_ids:
+            raise CommandError('Для товаров нужен хотя бы один поставщик (--vendors)')
+        ids = self.take_ids(Item, count)
+        prices = {}
+
+        def items():
+            for item_id in ids:
+                # цены распределены логнормально: много дешевых товаров и немного дорогих
+                price = Decimal(min(math.exp(self.rng.gauss(7, 1.2)), 999999)).quantize(Decimal('0.01'))
+                prices[item_id] = price
+                yield (item_id, f'Товар {item_id}', self.rng.choice(vendor_ids), price, self.rng.randint(0, 500),
+                       self.random_moment(), self.rng.random() > 0.05)
+
+        self.load(Item, ['id', 'name', 'vendor_id', 'price', 'quantity', 'updated_at', 'is_active'], items())
+
+        def item_info():
+            for item_id in ids:
+                for type_info in self.rng.sample(list(ITEM_INFO), self.rng.randint(1, 4)):
+                    yield (self.take_ids(ItemInfo, 1)[0], item_id, type_info, self.rng.choice(ITEM_INFO[type_info]))
+
+        self.load(ItemInfo, ['id', 'item_id', 'type_info', 'value_info'], item_info())
+        return prices
+
+    def generate_categories(self, count, item_ids, exponent):
+        ids = self.take_ids(Category, count)
+        self.load(Category, ['id', 'name'], ((category_id, f'Категория {category_id}') for category_id in ids))
+        if not ids:
+            return
+
+        # размеры категорий тоже неравномерны: в популярных категориях больше товаров
+        category_weights = zipf_cum_weights(len(ids), exponent)
+        through = Category.items.through
+
+        def links():
+            for item_id in item_ids:
+                categories = set(self.rng.choices(ids, cum_weights=category_weights, k=self.rng.randint(1, 3)))
+                for category_id in categories:
+                    yield (self.take_ids(through, 1)[0], category_id, item_id)
+
+        self.load(through, ['id', 'category_id', 'item_id'], links())
+
+    def generate_orders(self, count, customer_ids, address_ids, item_prices, max_order_items, exponent):
+        if not customer_ids or not item_prices:
+            return
+        # популярность товаров по Ципфу, порядок популярности не совпадает с порядком id
+        popular_items = list(item_prices)
+        self.rng.shuffle(popular_items)
+        item_weights = zipf_cum_weights(len(popular_items), exponent)
+        # покупатели тоже заказывают неравномерно, но с менее выраженным перекосом
+        customer_weights = zipf_cum_weights(len(customer_ids), 0.7)
+        size_weights = [1 / size for size in range(1, max_order_items + 1)]
+        states, state_weights = list(ORDER_STATES), list(ORDER_STATES.values())
+
+        order_rows, order_item_rows = [], []
+
+        def add_order(user_id, state, created_at):
+            order_id = self.take_ids(Order, 1)[0]
+            size = self.rng.choices(range(1, max_order_items + 1), weights=size_weights)[0]
+            order_items = set()
+            while len(order_items) < min(size, len(popular_items)):
+                order_items.add(self.rng.choices(popular_items, cum_weights=item_weights)[0])
+
+            total_price = Decimal('0.00')
+            for item_id in order_items:
+                quantity = self.rng.choices((1, 2, 3, 5), weights=(70, 20, 7, 3))[0]
+                total_price += item_prices[item_id] * quantity
+                order_item_rows.append((self.take_ids(OrderItem, 1)[0], order_id, item_id, quantity, item_prices[item_id]))
+
+            closed_at = min(created_at + datetime.timedelta(days=self.rng.randint(1, 14)), self.end) if state in CLOSED_STATES else None
+            updated_at = closed_at or created_at
+            address_id = None if state == 'basket' else address_ids[user_id]
+            order_rows.append((order_id, user_id, address_id, state, None, total_price, created_at, updated_at, closed_at))
+
+            if len(order_rows) >= self.batch_size:
+                self.flush_orders(order_rows, order_item_rows)
+
+        for _ in range(count):
+            user_id = self.rng.choices(customer_ids, cum_weights=customer_weights)[0]
+            add_order(user_id, self.rng.choices(states, weights=state_weights)[0], self.random_moment())
+
+        # у части покупателей есть непустая корзина
+        for user_id in self.rng.sample(customer_ids, len(customer_ids) // 10):
+            add_order(user_id, 'basket', self.random_moment(14))
+
+        self.flush_orders(order_rows, order_item_rows)
+
+    def flush_orders(self, order_rows, order_item_rows):
+        self.load(Order, ['id', 'user_id', 'address_id', 'state', 'comment', 'total_price', 'created_at', 'updated_at', 'closed_at'], order_rows)
+        self.load(OrderItem, ['id', 'order_id', 'item_id', 'quantity', 'price_at_order'], order_item_rows)
+        order_rows.clear()
+        order_item_rows.clear()
+
+    def load(self, model, fields, rows):
+        '''
+        Загружает строки пачками: на PostgreSQL через COPY, на остальных БД через executemany
+        '''
+        columns = [model._meta.get_field(field).column for field in fields]
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            if connection.vendor == 'postgresql':
+                self.copy(model._meta.db_table, columns, batch)
+            else:
+                self.insert(model, fields, columns, batch)
+            self.counts[model] = self.counts.get(model, 0) + len(batch)
+
+    def copy(self, table, columns, batch):
+        quote = connection.ops.quote_name
+        sql = f'COPY {quote(table)} ({", ".join(quote(column) for column in columns)}) FROM STDIN'
+        with connection.cursor() as cursor:
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy'):
+                # psycopg 3
+                with raw_cursor.copy(sql) as copy:
+                    for row in batch:
+                        copy.write_row(row)
+            else:
+                # psycopg2
+                raw_cursor.copy_expert(sql, io.StringIO(''.join(self.copy_line(row) for row in batch)))
+
+    @staticmethod
+    def copy_line(row):
+        values = []
+        for value in row:
+            if value is None:
+                values.append('\\N')
+            elif isinstance(value, bool):
+                values.append('t' if value else 'f')
+            elif isinstance(value, (datetime.date, datetime.datetime)):
+                values.append(value.isoformat())
+            else:
+                values.append(str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n'))
+        return '\t'.join(values) + '\n'
+
+    def insert(self, model, fields, columns, batch):
+        model_fields = [model._meta.get_field(field) for field in fields]
+        quote = connection.ops.quote_name
+        sql = (f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(column) for column in columns)}) '
+               f'VALUES ({", ".join(["%s"] * len(columns))})')
+        # bulk_create заменил бы created_at/updated_at текущим временем (auto_now), поэтому значения готовим сами
+        params = [
+            [field.get_db_prep_save(value, connection) for field, value in zip(model_fields, row)]
+            for row in batch
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def reset_sequences(self):
+        '''
+        После вставки с явными id счетчики последовательностей PostgreSQL нужно передвинуть, а статистику планировщика обновить
+        '''
+        if connection.vendor != 'postgresql':
+            return
+        models = list(self.counts)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+            for model in models:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
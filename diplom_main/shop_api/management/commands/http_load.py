@@ -0,0 +1,30 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from shop_api.bench import http_load
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный замер эндпоинта запущенного сервера: запросов/с и p50/p95/p99 при разном числе соединений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/items//', help='Адрес эндпоинта')
+        parser.add_argument('--unix', default=None, help='Unix-сокет сервера, например /run/gunicorn.sock')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--header', action='append', default=[], help='Дополнительный заголовок "Имя: значение"')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 200], help='Число одновременных соединений')
+        parser.add_argument('--requests', type=int, default=1000, help='Количество запросов на каждый уровень конкурентности')
+
+    def handle(self, *args, **options):
+        headers = dict(header.split(':', 1) for header in options['header'])
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+
+        self.stdout.write(f'{options['method']} {options['url']}')
+        for concurrency in options['concurrency']:
+            result = asyncio.run(http_load(
+                options['method'], options['url'], concurrency, options['requests'], headers, unix_socket=options['unix']))
+            style = self.style.SUCCESS if not result['errors'] else self.style.WARNING
+            self.stdout.write(style(
+                f'соединений {concurrency:>4}: {result['rps']:>8} запросов/с, p50 {result['p50_ms']} мс, '
+                f'p95 {result['p95_ms']} мс, p99 {result['p99_ms']} мс, статусы {result['statuses']}, ошибок соединения {result['errors']}'))
@@ -0,0 +1,173 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from shop_api.cache import invalidate_user_groups
+from shop_api.models import USER_TYPE_INFO, Position, StaffInfo, UserInfo
+
+User = get_user_model()
+
+INFO_TYPES = [type_info for type_info, _ in USER_TYPE_INFO]
+
+
+def _init_worker():
+    # при запуске процессов через spawn/forkserver django нужно инициализировать заново
+    django.setup()
+
+
+def _hash_password(password):
+    return make_password(password or None)
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт пользователей из CSV/NDJSON с параллельным хешированием паролей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .ndjson')
+        parser.add_argument('--delimiter', default=';', help='Разделитель колонок CSV')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество пользователей в одной пачке')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Количество процессов для хеширования паролей')
+        parser.add_argument('--inactive', action='store_true', help='Создавать пользователей неактивными (с подтверждением по email)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows, errors = self.read_rows(options['path'], options['delimiter'])
+
+        existing = set()
+        emails = list(rows)
+        for i in range(0, len(emails), options['batch_size']):
+            existing.update(User.objects.filter(email__in=emails[i:i + options['batch_size']]).values_list('email', flat=True))
+        new_emails = [email for email in emails if email not in existing]
+
+        hashes = dict(zip(new_emails, self.hash_passwords([rows[email].get('password') for email in new_emails], options['workers'], options['batch_size'])))
+
+        groups = dict(Group.objects.values_list('name', 'id'))
+        created = 0
+        for i in range(0, len(emails), options['batch_size']):
+            batch = emails[i:i + options['batch_size']]
+            with transaction.atomic():
+                self.create_users(batch, rows, hashes, not options['inactive'])
+                user_ids = dict(User.objects.filter(email__in=batch).values_list('email', 'id'))
+                created += len([email for email in batch if email in user_ids and email not in existing])
+                self.create_groups(batch, rows, user_ids, groups, errors)
+                self.create_user_info(batch, rows, user_ids)
+            invalidate_user_groups(*user_ids.values())
+
+        # руководители могут идти в файле позже сотрудников, поэтому StaffInfo создаем после всех пользователей
+        staff_created = self.create_staff_info(rows, options['batch_size'], errors)
+
+        for error in errors:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {len(rows)}, создано пользователей: {created}, уже существовало: {len(existing)}, '
+            f'создано записей сотрудников: {staff_created}, за {time.monotonic() - started:.1f} с'))
+
+    def read_rows(self, path, delimiter):
+        '''
+        Читает файл и возвращает словарь email -> строка (последняя строка с одинаковым email побеждает)
+        '''
+        errors = []
+        try:
+            with open(path, encoding='utf-8') as file:
+                if path.endswith('.ndjson') or path.endswith('.jsonl'):
+                    raw_rows = [json.loads(line) for line in file if line.strip()]
+                else:
+                    raw_rows = list(csv.DictReader(file, delimiter=delimiter))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать файл {path}: {e}')
+
+        rows = {}
+        for line_number, row in enumerate(raw_rows, start=1):
+            if not row.get('email') or not row.get('first_name') or not row.get('last_name'):
+                errors.append(f'Строка {line_number}: email, first_name и last_name обязательны')
+                continue
+            rows[User.objects.normalize_email(row['email'].strip())] = row
+        return rows, errors
+
+    def hash_passwords(self, passwords, workers, batch_size):
+        if not passwords:
+            return []
+        # пароли раздаем процессам порциями, чтобы загрузить все процессы и не гонять каждый пароль через pickle отдельно
+        chunksize = max(1, min(batch_size, len(passwords) // (workers * 4)))
+
+        # дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            return list(executor.map(_hash_password, passwords, chunksize=chunksize))
+
+    def create_users(self, batch, rows, hashes, is_active):
+        users = [
+            User(
+                email=email,
+                first_name=rows[email]['first_name'],
+                last_name=rows[email]['last_name'],
+                password=hashes[email],
+                is_active=is_active,
+            )
+            for email in batch
+            if email in hashes
+        ]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+
+    def create_groups(self, batch, rows, user_ids, groups, errors):
+        memberships = []
+        for email in batch:
+            for group_name in self.split_list(rows[email].get('groups')):
+                if group_name not in groups:
+                    errors.append(f'{email}: группа "{group_name}" не найдена')
+                    continue
+                memberships.append(User.groups.through(user_id=user_ids[email], group_id=groups[group_name]))
+        User.groups.through.objects.bulk_create(memberships, ignore_conflicts=True)
+
+    def create_user_info(self, batch, rows, user_ids):
+        user_info = [
+            UserInfo(user_id=user_ids[email], type_info=type_info, value_info=rows[email][type_info])
+            for email in batch
+            for type_info in INFO_TYPES
+            if rows[email].get(type_info)
+        ]
+        UserInfo.objects.bulk_create(user_info, ignore_conflicts=True)
+
+    def create_staff_info(self, rows, batch_size, errors):
+        staff_rows = {email: row for email, row in rows.items() if row.get('position') or row.get('manager')}
+        if not staff_rows:
+            return 0
+
+        position_names = {row['position'] for row in staff_rows.values() if row.get('position')}
+        Position.objects.bulk_create([Position(name=name) for name in position_names], ignore_conflicts=True)
+        positions = dict(Position.objects.filter(name__in=position_names).values_list('name', 'id'))
+
+        manager_emails = {User.objects.normalize_email(row['manager']) for row in staff_rows.values() if row.get('manager')}
+        user_ids = dict(User.objects.filter(email__in=set(staff_rows) | manager_emails).values_list('email', 'id'))
+        existing_staff = set(StaffInfo.objects.filter(user_id__in=user_ids.values()).values_list('user_id', flat=True))
+
+        staff_info = []
+        for email, row in staff_rows.items():
+            if user_ids[email] in existing_staff:
+                continue
+            manager_id = None
+            if row.get('manager'):
+                manager_id = user_ids.get(User.objects.normalize_email(row['manager']))
+                if manager_id is None:
+                    errors.append(f'{email}: руководитель {row['manager']} не найден')
+            staff_info.append(StaffInfo(user_id=user_ids[email], manager_id=manager_id, position_id=positions.get(row.get('position'))))
+
+        StaffInfo.objects.bulk_create(staff_info, batch_size=batch_size, ignore_conflicts=True)
+        return len(staff_info)
+
+    @staticmethod
+    def split_list(value):
+        if not value:
+            return []
+        if isinstance(value, list):
+            return value
+        return [item.strip() for item in value.split(',') if item.strip()]
@@ -0,0 +1,103 @@
+import datetime
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from shop_api.loadtest import SCENARIOS, HttpTransport, InProcessTransport, LoadTestContext, run_scenario
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочное тестирование API по сценариям: запросов/с, p50/p95/p99 и запросы к БД, сравнение с сохраненным baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS), help='Сценарии для запуска')
+        parser.add_argument('--iterations', type=int, default=200, help='Количество итераций каждого сценария')
+        parser.add_argument('--concurrency', type=int, default=1, help='Количество параллельных потоков')
+        parser.add_argument('--base-url', default=None, help='Адрес запущенного сервера, например http://127.0.0.1:8000 (по умолчанию - запросы в текущий процесс)')
+        parser.add_argument('--unix', default=None, help='Unix-сокет сервера, например /run/gunicorn.sock')
+        parser.add_argument('--password', default='qwe', help='Пароль тестовых пользователей')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно выбора товаров и категорий')
+        parser.add_argument('--save-baseline', default=None, help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline', default=None, help='Сравнить с результатами из JSON-файла')
+        parser.add_argument('--max-regression', type=float, default=None, help='Завершиться с ошибкой, если p95 вырос больше чем на N процентов или выросло число запросов к БД')
+
+    def handle(self, *args, **options):
+        if options['base_url'] or options['unix']:
+            transport = HttpTransport(options['base_url'] or 'http://localhost', options['unix'])
+            results = self.run(transport, options)
+        else:
+            # в текущем процессе письма не отправляем, а запросы идут от имени testserver
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = self.run(InProcessTransport(), options)
+
+        report = {
+            'commit': self.git_commit(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'mode': options['base_url'] or options['unix'] or 'in-process',
+            'iterations': options['iterations'],
+            'concurrency': options['concurrency'],
+            'scenarios': results,
+        }
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options['save_baseline']}')
+
+        if options['baseline']:
+            regressions = self.compare(report, options['baseline'], options['max_regression'])
+            if regressions:
+                raise CommandError(f'Регрессия производительности: {', '.join(regressions)}')
+
+    def run(self, transport, options):
+        try:
+            context = LoadTestContext(transport, options['concurrency'], options['password'], options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        results = {}
+        for name in options['scenario']:
+            result = results[name] = run_scenario(context, name, options['iterations'], options['concurrency'])
+            style = self.style.SUCCESS if not result['errors'] else self.style.WARNING
+            queries = ''
+            if result['avg_queries'] is not None:
+                queries = f', запросов к БД {result['avg_queries']} (макс. {result['max_queries']})'
+            self.stdout.write(style(
+                f'{name:<14} {result['requests']:>6} запросов, {result['rps']:>8} запросов/с, p50 {result['p50_ms']} мс, '
+                f'p95 {result['p95_ms']} мс, p99 {result['p99_ms']} мс, ошибок {result['errors']}{queries}'))
+        return results
+
+    def compare(self, report, path, max_regression):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать baseline {path}: {e}')
+
+        self.stdout.write(f'\nСравнение с {path} (коммит {baseline.get('commit') or '-'}, {baseline.get('created_at')}):')
+        regressions = []
+        for name, result in report['scenarios'].items():
+            before = baseline['scenarios'].get(name)
+            if before is None:
+                continue
+            p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+            rps_change = (result['rps'] - before['rps']) / before['rps'] * 100 if before['rps'] else 0.0
+            queries_change = (result['avg_queries'] or 0) - (before['avg_queries'] or 0)
+
+            regressed = max_regression is not None and (p95_change > max_regression or queries_change > 0)
+            if regressed:
+                regressions.append(name)
+            style = self.style.ERROR if regressed else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name:<14} p95 {before['p95_ms']} -> {result['p95_ms']} мс ({p95_change:+.1f}%), '
+                f'запросов/с {before['rps']} -> {result['rps']} ({rps_change:+.1f}%), запросов к БД {queries_change:+.2f}'))
+        return regressions
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,96 @@
+import datetime
+import json
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shop_api.microbench import BENCHMARKS, BenchmarkSkipped, Fixtures, ParityError, run_benchmark
+
+DEFAULT_TOLERANCE = 25.0
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарки сериализаторов, разбора CSV и генерации накладной с проверкой регрессий относительно baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS), help='Бенчмарки для запуска')
+        parser.add_argument('--rounds', type=int, default=7, help='Количество раундов каждого бенчмарка')
+        parser.add_argument('--warmup', type=int, default=2, help='Количество прогревочных вызовов')
+        parser.add_argument('--min-time', type=float, default=0.2, help='Минимальная длительность раунда в секундах')
+        parser.add_argument('--save-baseline', default=None, help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--baseline', default=None, help='Сравнить с результатами из JSON-файла')
+        parser.add_argument('--tolerance', type=float, default=None,
+                            help=f'Допустимое замедление в процентах (по умолчанию из baseline или {DEFAULT_TOLERANCE})')
+
+    def handle(self, *args, **options):
+        results = {}
+        # фикстуры создаются в транзакции, которая откатывается после замеров
+        with transaction.atomic():
+            fixtures = Fixtures()
+            for name in options['benchmark']:
+                try:
+                    func = BENCHMARKS[name](fixtures)
+                except BenchmarkSkipped as e:
+                    self.stdout.write(self.style.WARNING(f'{name:<22} пропущен: {e}'))
+                    continue
+                except ParityError as e:
+                    raise CommandError(str(e))
+                result = results[name] = run_benchmark(func, options['rounds'], options['warmup'], options['min_time'])
+                self.stdout.write(
+                    f'{name:<22} медиана {result['median_ms']:>10.3f} мс, минимум {result['min_ms']:>10.3f} мс, '
+                    f'разброс {result['stdev_ms']:.3f} мс ({result['rounds']} x {result['calls_per_round']})')
+            transaction.set_rollback(True)
+
+        self.check_baseline(results, options)
+
+    def check_baseline(self, results, options):
+        '''
+        Сохранение результатов (--save-baseline) и сравнение с baseline (--baseline)
+        '''
+        if options['save_baseline']:
+            report = {
+                'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'machine': platform.node(),
+                'tolerance': options['tolerance'] if options['tolerance'] is not None else DEFAULT_TOLERANCE,
+                'benchmarks': results,
+            }
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options['save_baseline']}')
+
+        if options['baseline']:
+            regressions = self.compare(results, options['baseline'], options['tolerance'])
+            if regressions:
+                raise CommandError(f'Регрессия производительности: {', '.join(regressions)}')
+
+    def compare(self, results, path, tolerance):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать baseline {path}: {e}')
+
+        if tolerance is None:
+            tolerance = baseline.get('tolerance', DEFAULT_TOLERANCE)
+        self.stdout.write(f'\nСравнение с {path} ({baseline.get('created_at')}, {baseline.get('machine')}), допуск {tolerance}%:')
+        if baseline.get('machine') != platform.node():
+            self.stdout.write(self.style.WARNING('Baseline снят на другой машине, сравнение может быть неточным'))
+
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get('benchmarks', {}).get(name)
+            if not previous:
+                self.stdout.write(f'{name:<22} нет в baseline')
+                continue
+            # допуск можно задать отдельно для бенчмарка в файле baseline
+            allowed = previous.get('tolerance', tolerance)
+            # сравнивается минимум по раундам: он меньше всего зависит от фоновой нагрузки на машину
+            change = (result['min_ms'] - previous['min_ms']) / previous['min_ms'] * 100
+            regressed = change > allowed
+            if regressed:
+                regressions.append(name)
+            style = self.style.ERROR if regressed else self.style.SUCCESS
+            self.stdout.write(style(f'{name:<22} {previous['min_ms']:.3f} -> {result['min_ms']:.3f} мс ({change:+.1f}%, допуск {allowed}%)'))
+        return regressions
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from shop_api.models import SlowQuery
+
+ORDERINGS = {
+    'total': F('total_time').desc(),
+    'calls': F('calls').desc(),
+    'max': F('max_time').desc(),
+    'avg': (F('total_time') / F('calls')).desc(),
+}
+
+
+class Command(BaseCommand):
+    help = 'Отчет по медленным запросам к БД из журнала SlowQuery'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Сколько запросов показать')
+        parser.add_argument('--order-by', choices=ORDERINGS, default='total', help='Сортировка: суммарное, среднее, максимальное время или количество')
+        parser.add_argument('--plans', action='store_true', help='Показать планы выполнения')
+        parser.add_argument('--reset', action='store_true', help='Очистить журнал')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}'))
+            return
+
+        slow_queries = SlowQuery.objects.order_by(ORDERINGS[options['order_by']])[:options['limit']]
+        if not slow_queries:
+            self.stdout.write('Медленных запросов не найдено.')
+            return
+
+        for number, query in enumerate(slow_queries, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{number}. [{query.fingerprint[:8]}] {query.calls} раз, всего {query.total_time:.0f} мс, '
+                f'в среднем {query.total_time / query.calls:.0f} мс, максимум {query.max_time:.0f} мс, БД {query.database}'))
+            self.stdout.write(f'   Последний раз: {query.last_seen:%Y-%m-%d %H:%M:%S}, вызов: {query.call_site or "-"}')
+            self.stdout.write(f'   {query.normalized_sql}')
+            if options['plans'] and query.plan:
+                title = 'EXPLAIN ANALYZE' if query.plan_analyzed else 'EXPLAIN'
+                self.stdout.write(f'   {title}:')
+                for line in query.plan.splitlines():
+                    self.stdout.write(f'     {line}')
+            self.stdout.write('')
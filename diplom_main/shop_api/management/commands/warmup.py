@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from shop_api.warmup import STEPS, run_warmup
+
+
+class Command(BaseCommand):
+    help = 'Прогрев кэшей после деплоя: URLconf, шаблоны, группы пользователей, категории и популярные товары'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--step', nargs='+', choices=STEPS, default=list(STEPS), help='Шаги прогрева')
+        parser.add_argument('--timeout', type=float, default=None, help='Ограничение на весь прогрев, сек (по умолчанию WARMUP_TIMEOUT)')
+
+    def handle(self, *args, **options):
+        report = run_warmup(options['timeout'], options['step'])
+        styles = {'ok': self.style.SUCCESS, 'timeout': self.style.WARNING, 'skipped': self.style.WARNING, 'error': self.style.ERROR}
+        for result in report:
+            line = f'{result['step']:<12} {result['status']:<8} прогрето: {result['warmed']:>5}, {result['duration_ms']:>9.2f} мс'
+            if 'error' in result:
+                line += f' ({result['error']})'
+            self.stdout.write(styles[result['status']](line))
+        self.stdout.write(f'Всего: {sum(result['duration_ms'] for result in report):.2f} мс')
@@ -0,0 +1,275 @@
+'''
+Метрики в формате Prometheus без внешних зависимостей.
+
+Каждый процесс копит значения в памяти и не чаще раза в METRICS_FLUSH_INTERVAL
+секунд записывает их в свой файл в METRICS_DIR. Эндпоинт /metrics складывает
+файлы всех воркеров gunicorn, поэтому результат не зависит от того, какой воркер
+ответил. Без METRICS_DIR отдаются метрики только текущего процесса.
+
+Каталог METRICS_DIR нужно очищать при перезапуске сервиса
+(в gunicorn.service для этого используется RuntimeDirectory).
+'''
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._pid = None
+        self._path = None
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _reset_after_fork(self):
+        # после fork дочерний процесс не должен продолжать значения и файл родителя
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = None
+            self._values = {}
+
+    def update(self, name, labels, update):
+        with self._lock:
+            self._reset_after_fork()
+            key = (name, labels)
+            self._values[key] = update(self._values.get(key))
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if settings.METRICS_DIR and time.monotonic() - self._flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        '''
+        Атомарно (через временный файл и os.replace) записывает значения процесса в METRICS_DIR
+        '''
+        if not settings.METRICS_DIR:
+            return
+        with self._lock:
+            self._reset_after_fork()
+            self._flushed_at = time.monotonic()
+            if not self._values and self._path is None:
+                return
+            if self._path is None:
+                # pid может быть переиспользован новым воркером, поэтому к имени добавляем случайный суффикс
+                self._path = os.path.join(settings.METRICS_DIR, f'{self._pid}-{uuid.uuid4().hex[:8]}.json')
+            data = [[name, list(labels), self._copy(value)] for (name, labels), value in self._values.items()]
+        tmp_path = f'{self._path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self._path)
+
+    def collect(self):
+        '''
+        Значения всех процессов: {(name, labels): value}
+        '''
+        if not settings.METRICS_DIR:
+            with self._lock:
+                self._reset_after_fork()
+                return {key: self._copy(value) for key, value in self._values.items()}
+
+        self.flush()
+        merged = {}
+        for file_name in os.listdir(settings.METRICS_DIR):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, file_name)) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in data:
+                metric = self._metrics.get(name)
+                if metric is not None:
+                    key = (name, tuple(labels))
+                    merged[key] = metric.merge(merged.get(key), value)
+        return merged
+
+    @staticmethod
+    def _copy(value):
+        return list(value) if isinstance(value, list) else value
+
+    def exposition(self):
+        '''
+        Текст в формате Prometheus text exposition 0.0.4
+        '''
+        values = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            # в формате 0.0.4 имя семейства счетчика совпадает с именем значения (с суффиксом _total)
+            family = f'{name}_total' if metric.kind == 'counter' else name
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.kind}')
+            for (value_name, labels), value in sorted(values.items()):
+                if value_name == name:
+                    lines.extend(metric.render(dict(zip(metric.labelnames, labels)), value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+# несброшенные значения воркера записываем при его штатном завершении
+atexit.register(registry.flush)
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label_value(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _labels(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        registry.update(self.name, self._labels(labels), lambda value: (value or 0) + amount)
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, labels, value):
+        return [f'{self.name}_total{format_labels(labels)} {format_value(value)}']
+
+
+class Histogram(Metric):
+    '''
+    Значение хранится списком: счетчики по корзинам buckets, затем сумма и количество наблюдений
+    '''
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        def update(value):
+            value = value or [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    value[i] += 1
+                    break
+            value[-2] += amount
+            value[-1] += 1
+            return value
+        registry.update(self.name, self._labels(labels), update)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{format_labels({**labels, 'le': format_value(float(bound))})} {cumulative}')
+        lines.append(f'{self.name}_bucket{format_labels({**labels, 'le': '+Inf'})} {value[-1]}')
+        lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(float(value[-2]))}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {value[-1]}')
+        return lines
+
+
+def response_result(response):
+    '''
+    Результат по ответу: поле status тела ответа, если оно есть, иначе по коду ответа
+    '''
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and data.get('status') in ('success', 'partial_success', 'error'):
+        return data['status']
+    return 'success' if response.status_code < 400 else 'error'
+
+
+def track_result(histogram, counter=None):
+    '''
+    Декоратор метода представления: время выполнения и результат (label result)
+    '''
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = 'error'
+            try:
+                response = method(*args, **kwargs)
+                result = response_result(response)
+                return response
+            finally:
+                histogram.observe(time.perf_counter() - started, result=result)
+                if counter is not None:
+                    counter.inc(result=result)
+        return wrapper
+    return decorator
+
+
+REQUEST_LATENCY = Histogram(
+    'shop_http_request_duration_seconds', 'Время обработки запроса', ['view', 'action', 'method', 'status'])
+CHECKOUT_DURATION = Histogram(
+    'shop_checkout_duration_seconds', 'Время оформления заказа (start_order)', ['result'])
+CHECKOUT_ORDERS = Counter(
+    'shop_checkout_orders', 'Оформленные заказы', ['result'])
+IMPORT_DURATION = Histogram(
+    'shop_items_import_duration_seconds', 'Время загрузки товаров из CSV', ['result'])
+IMPORTS = Counter(
+    'shop_items_imports', 'Загрузки товаров из CSV', ['result'])
+IMPORT_ROWS = Counter(
+    'shop_items_import_rows', 'Строки CSV при загрузке товаров', ['result'])
+EMAIL_DURATION = Histogram(
+    'shop_email_duration_seconds', 'Время отправки писем', ['kind'])
+PDF_DURATION = Histogram(
+    'shop_pdf_render_duration_seconds', 'Время генерации PDF-накладной')
+BASKET_OPERATIONS = Counter(
+    'shop_basket_operations', 'Операции с корзиной', ['operation'])
+BASKET_ITEMS = Counter(
+    'shop_basket_items', 'Количество товаров, добавленных в корзину', ['operation'])
+COMPRESSION_BYTES = Counter(
+    'shop_http_compression_bytes', 'Размер тел ответов до и после сжатия', ['encoding', 'stage'])
+COMPRESSION_DURATION = Histogram(
+    'shop_http_compression_duration_seconds', 'Время сжатия тела ответа', ['encoding'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+SLOW_QUERIES_DROPPED = Counter(
+    'shop_slow_queries_dropped', 'Медленные запросы, отброшенные из-за переполнения буфера журнала')
@@ -0,0 +1,217 @@
+'''
+Микробенчмарки отдельных слоев API (см. manage.py microbench).
+
+Бенчмарк - функция, получающая фикстуры и возвращающая функцию одного замера.
+Фикстуры фиксированные (одинаковое количество и содержимое объектов) и создаются
+в транзакции, которую команда откатывает, поэтому результаты не зависят от данных в БД.
+'''
+import csv
+import io
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .models import Address, Category, Item, ItemInfo, Order, OrderItem
+from .fast_json import FastJSONParser, FastJSONRenderer
+from .fast_serializers import fast_item_serializer, fast_order_serializer
+from .serializers import ItemSerializer, OrderSerializer, RegisterSerializer
+from .utils import render_invoice_pdf
+
+User = get_user_model()
+
+ITEMS = 1000
+CATEGORIES = 10
+CATEGORIES_PER_ITEM = 3
+ORDERS = 100
+ITEMS_PER_ORDER = 3
+CSV_ROWS = 100
+
+
+class BenchmarkSkipped(Exception):
+    pass
+
+
+class ParityError(Exception):
+    pass
+
+
+class Fixtures:
+    '''
+    Фиксированный набор объектов для бенчмарков
+    '''
+    def __init__(self):
+        self.vendor = User.objects.create_user(email='microbench-vendor@diplom.com', first_name='Поставщик', last_name='Тестовый', password='microbench', is_active=True)
+        self.customer = User.objects.create_user(email='microbench-customer@diplom.com', first_name='Покупатель', last_name='Тестовый', password='microbench', is_active=True)
+        self.address = Address.objects.create(user=self.customer, city='Москва', street='Тестовая', house='1', appartment=1)
+
+        categories = Category.objects.bulk_create(Category(name=f'microbench-категория-{number}') for number in range(CATEGORIES))
+        items = Item.objects.bulk_create(
+            Item(name=f'microbench-товар-{number}', vendor=self.vendor, price=Decimal(100 + number) + Decimal('0.99'), quantity=number + 1)
+            for number in range(ITEMS))
+        Category.items.through.objects.bulk_create(
+            Category.items.through(category=categories[(number + shift) % CATEGORIES], item=item)
+            for number, item in enumerate(items) for shift in range(CATEGORIES_PER_ITEM))
+        ItemInfo.objects.bulk_create(ItemInfo(item=item, type_info='Цвет', value_info='Черный') for item in items)
+
+        orders = Order.objects.bulk_create(
+            Order(user=self.customer, address=self.address, state='created', total_price=Decimal('300.00'), comment='microbench')
+            for _ in range(ORDERS))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, item=items[(number + shift) % ITEMS], quantity=1, price_at_order=Decimal('100.00'))
+            for number, order in enumerate(orders) for shift in range(ITEMS_PER_ORDER))
+
+        # запросы выполняются один раз, бенчмарки измеряют только сериализацию
+        self.items_queryset = Item.objects.filter(vendor=self.vendor).order_by('id')
+        self.orders_queryset = Order.objects.filter(user=self.customer).order_by('id')
+        self.items = list(self.items_queryset.prefetch_related(Prefetch('categories', queryset=Category.objects.order_by('id'))))
+        self.orders = list(self.orders_queryset)
+        self.invoice_order = (
+            Order.objects.select_related('user', 'address')
+            .prefetch_related(Prefetch('order_item', queryset=OrderItem.objects.select_related('item')))
+            .get(pk=orders[0].pk))
+
+        lines = ['name;price;quantity;type_1;value_1;type_2;value_2']
+        lines += [f'microbench-импорт-{number};{100 + number}.50;{10 + number};Цвет;Черный;Гарантия;12 мес.' for number in range(CSV_ROWS)]
+        self.csv_rows = list(csv.DictReader(lines, delimiter=';'))
+
+
+def item_serializer(fixtures):
+    return lambda: ItemSerializer(fixtures.items, many=True).data
+
+
+def order_serializer(fixtures):
+    return lambda: OrderSerializer(fixtures.orders, many=True).data
+
+
+def check_parity(name, expected, actual):
+    '''
+    Ответ быстрого сериализатора должен совпадать с DRF побайтно
+    '''
+    renderer = JSONRenderer()
+    if renderer.render(expected) != renderer.render(actual):
+        raise ParityError(f'{name}: ответ отличается от DRF-сериализатора')
+
+
+def fast_serializer_benchmark(name, fast_serializer, serializer_class, objects, queryset):
+    check_parity(name, serializer_class(objects, many=True).data, fast_serializer.serialize(queryset))
+
+    # как и для DRF-сериализатора, запросы выполняются заранее
+    rows = list(fast_serializer.values(queryset))
+    relations = fast_serializer.load_relations(rows)
+    return lambda: fast_serializer.format_rows(rows, relations)
+
+
+def fast_item_serializer_benchmark(fixtures):
+    return fast_serializer_benchmark('fast_item_serializer', fast_item_serializer, ItemSerializer, fixtures.items, fixtures.items_queryset)
+
+
+def fast_order_serializer_benchmark(fixtures):
+    return fast_serializer_benchmark('fast_order_serializer', fast_order_serializer, OrderSerializer, fixtures.orders, fixtures.orders_queryset)
+
+
+def json_payload(fixtures):
+    # ответы списков и значения, которые кодирует JSONEncoder: Decimal и datetime
+    return {
+        'items': ItemSerializer(fixtures.items, many=True).data,
+        'orders': OrderSerializer(fixtures.orders, many=True).data,
+        'raw': [{'id': item.id, 'price': item.price, 'updated_at': item.updated_at} for item in fixtures.items],
+    }
+
+
+def json_render(renderer_class):
+    def benchmark(fixtures):
+        payload = json_payload(fixtures)
+        if renderer_class is FastJSONRenderer and FastJSONRenderer().render(payload) != JSONRenderer().render(payload):
+            raise ParityError('json_render_fast: ответ отличается от JSONRenderer')
+        renderer = renderer_class()
+        return lambda: renderer.render(payload)
+    return benchmark
+
+
+def json_parse(parser_class):
+    def benchmark(fixtures):
+        content = JSONRenderer().render(json_payload(fixtures))
+        if parser_class is FastJSONParser and FastJSONParser().parse(io.BytesIO(content)) != JSONParser().parse(io.BytesIO(content)):
+            raise ParityError('json_parse_fast: результат отличается от JSONParser')
+        parser = parser_class()
+        return lambda: parser.parse(io.BytesIO(content))
+    return benchmark
+
+
+def register_validation(fixtures):
+    data = {'email': 'microbench-new@diplom.com', 'first_name': 'Иван', 'last_name': 'Иванов', 'password': 'Sl0zhny-Parol'}
+
+    def run():
+        serializer = RegisterSerializer(data=data)
+        if not serializer.is_valid():
+            raise ValueError(serializer.errors)
+    return run
+
+
+def csv_row_parsing(fixtures):
+    from .views import parse_csv_row
+
+    def run():
+        for row in fixtures.csv_rows:
+            serializer = ItemSerializer(data=parse_csv_row(row, fixtures.vendor.id))
+            if not serializer.is_valid():
+                raise ValueError(serializer.errors)
+    return run
+
+
+def invoice_pdf(fixtures):
+    # WeasyPrint требует системных библиотек (pango), без них бенчмарк пропускается
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as e:
+        raise BenchmarkSkipped(f'WeasyPrint недоступен: {e}')
+    return lambda: render_invoice_pdf(fixtures.invoice_order)
+
+
+BENCHMARKS = {
+    'item_serializer': item_serializer,
+    'fast_item_serializer': fast_item_serializer_benchmark,
+    'order_serializer': order_serializer,
+    'fast_order_serializer': fast_order_serializer_benchmark,
+    'json_render_drf': json_render(JSONRenderer),
+    'json_render_fast': json_render(FastJSONRenderer),
+    'json_parse_drf': json_parse(JSONParser),
+    'json_parse_fast': json_parse(FastJSONParser),
+    'register_validation': register_validation,
+    'csv_row_parsing': csv_row_parsing,
+    'invoice_pdf': invoice_pdf,
+}
+
+
+def run_benchmark(func, rounds, warmup, min_time):
+    '''
+    Прогревает func, затем выполняет rounds раундов. Раунд - столько вызовов func подряд,
+    чтобы он длился не меньше min_time секунд. Время вызова в мс: медиана и минимум по раундам
+    '''
+    for _ in range(warmup):
+        func()
+
+    started = time.perf_counter()
+    func()
+    single = time.perf_counter() - started
+    calls = max(int(min_time / single), 1) if single else 1
+
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        timings.append((time.perf_counter() - started) / calls * 1000)
+
+    return {
+        'median_ms': round(statistics.median(timings), 4),
+        'min_ms': round(min(timings), 4),
+        'stdev_ms': round(statistics.stdev(timings), 4) if len(timings) > 1 else 0.0,
+        'calls_per_round': calls,
+        'rounds': rounds,
+    }
@@ -0,0 +1,269 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+from .authentication import ClaimsJWTAuthentication
+from .compression import acompress_stream, choose_encoding, compress, compress_stream, is_compressible
+from .db_routers import pin_to_primary, replica_aliases, replica_read_request
+from .instrumentation import QueryRecorder, check_query_budget, current_recorder, query_report
+from .metrics import COMPRESSION_BYTES, REQUEST_LATENCY
+from .profiling import PROFILING_MODES, profile_call
+from .view_actions import get_view_action, get_view_label
+
+
+class HybridMiddleware:
+    '''
+    Основа middleware проекта, работающих и под WSGI, и под ASGI без переключения потоков.
+    MiddlewareMixin под ASGI выполняет каждый хук через sync_to_async, здесь же хуки
+    process_request, process_view и process_response вызываются прямо в цикле событий,
+    поэтому не должны блокировать (обращаться к БД или сети). Хук, которому это нужно,
+    переопределяет асинхронный вариант: aprocess_view или aprocess_response
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # process_view Django вызывает в режиме обработчика: синхронный хук под ASGI выполнялся бы в потоке
+            if hasattr(self, 'process_view'):
+                self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return await self.aprocess_response(request, response)
+
+    def process_request(self, request):
+        return None
+
+    def process_response(self, request, response):
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return type(self).process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_response(self, request, response):
+        return self.process_response(request, response)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    '''
+    Разрешает ReplicaRouter читать с реплик для безопасных запросов к действиям,
+    перечисленным в replica_read_actions представления.
+    После успешной записи закрепляет клиента за основной БД на REPLICA_PIN_SECONDS (см. pin_to_primary)
+    '''
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or not replica_aliases():
+            return None
+        view_cls, action = get_view_action(request, view_func)
+        if action in getattr(view_cls, 'replica_read_actions', []):
+            replica_read_request.set(request)
+        return None
+
+    def process_response(self, request, response):
+        replica_read_request.set(None)
+        # пакет запросов (BatchView) сообщает, были ли в нем записи, через request.replica_pin
+        if request.method not in SAFE_METHODS and response.status_code < 400 and getattr(request, 'replica_pin', True) and replica_aliases():
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(response)
+        return response
+
+
+class QueryInstrumentationMiddleware(HybridMiddleware):
+    '''
+    Считает запросы к БД за время обработки запроса (см. shop_api.instrumentation).
+    Стоит в MIDDLEWARE раньше всех middleware, которые обращаются к БД (сессии, аутентификация, реплики),
+    чтобы учитывать их запросы. Журнал медленных запросов пишется в отдельном потоке
+    (см. shop_api.slow_queries) и в бюджет не входит
+    '''
+    def process_request(self, request):
+        request._query_recorder = QueryRecorder()
+        current_recorder.set(request._query_recorder)
+        return None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_cls, action = get_view_action(request, view_func)
+        if view_cls is not None:
+            request._query_recorder.label = f'{view_cls.__name__}.{action}'
+            request._query_view = view_cls, action
+        return None
+
+    def process_response(self, request, response):
+        current_recorder.set(None)
+        recorder = getattr(request, '_query_recorder', None)
+        if recorder is None:
+            return response
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f'{recorder.total_time * 1000:.2f}'
+            if recorder.slowest_sql:
+                response['X-DB-Slowest-Ms'] = f'{recorder.slowest_time * 1000:.2f}'
+                response['X-DB-Slowest-SQL'] = ' '.join(recorder.slowest_sql.split())[:300].encode('ascii', 'replace').decode()
+
+        if recorder.label is not None:
+            query_report.add(recorder)
+            view_cls, action = request._query_view
+            check_query_budget(view_cls, action, recorder, settings.QUERY_BUDGETS_ENFORCE)
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    '''
+    Гистограмма времени обработки запросов по представлению и действию
+    '''
+    def process_request(self, request):
+        request._metrics_started = time.perf_counter()
+        return None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_cls, action = get_view_action(request, view_func)
+        request._metrics_view = (view_cls.__name__ if view_cls else view_func.__name__), action
+        return None
+
+    def process_response(self, request, response):
+        started = getattr(request, '_metrics_started', None)
+        if started is not None:
+            # запросы без найденного маршрута объединяем, чтобы случайные URL не плодили метрики
+            view, action = getattr(request, '_metrics_view', ('unresolved', ''))
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                view=view, action=action, method=request.method, status=response.status_code)
+        return response
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    '''
+    Профилирует отдельные запросы (см. shop_api.profiling).
+    Сотрудник включает профилирование заголовком X-Profile или параметром ?profile=
+    (значение - режим cprofile или sampling, по умолчанию cprofile).
+    Кроме того, доля запросов к представлениям из PROFILING_SAMPLE_RATES профилируется в режиме sampling.
+    При PROFILING_ENABLED = False middleware отключается при запуске и ничего не стоит.
+    Должен стоять последним в MIDDLEWARE, так как сам вызывает представление
+    '''
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # асинхронные представления выполняются в другом потоке/цикле событий, их не профилируем
+        if iscoroutinefunction(view_func):
+            return None
+
+        label = get_view_label(request, view_func)
+        mode = self.requested_mode(request)
+        if mode is None:
+            if random.random() >= settings.PROFILING_SAMPLE_RATES.get(label, 0):
+                return None
+            mode = 'sampling'
+
+        def call_view():
+            response = view_func(request, *view_args, **view_kwargs)
+            # сериализация ответа DRF тоже входит в профиль
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            return response
+
+        response, file_name = profile_call(mode, label, call_view)
+        response['X-Profile-File'] = file_name
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # хук сам вызывает синхронное представление, поэтому в поток переходим,
+        # только если запрос может быть профилирован
+        if iscoroutinefunction(view_func):
+            return None
+        if not self.profile_requested(request) and get_view_label(request, view_func) not in settings.PROFILING_SAMPLE_RATES:
+            return None
+        return await sync_to_async(type(self).process_view, thread_sensitive=True)(self, request, view_func, view_args, view_kwargs)
+
+    @staticmethod
+    def profile_requested(request):
+        return bool(request.headers.get('X-Profile') or request.GET.get('profile'))
+
+    def requested_mode(self, request):
+        mode = request.headers.get('X-Profile') or request.GET.get('profile')
+        if not mode:
+            return None
+        mode = mode if mode in PROFILING_MODES else 'cprofile'
+        return mode if self.is_staff(request) else None
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            auth = ClaimsJWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return auth is not None and auth[0].is_staff
+
+
+class CompressionMiddleware(HybridMiddleware):
+    '''
+    Сжимает ответы brotli или gzip (см. shop_api.compression): обычные - если тело не меньше
+    COMPRESSION_MIN_SIZE байт, потоковые - по порциям. Стоит сразу после MetricsMiddleware,
+    чтобы сжимать окончательное тело ответа и учитывать время сжатия в метриках
+    '''
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not is_compressible(response):
+            return response
+
+        if response.streaming:
+            length = response.get('Content-Length')
+            if length and int(length) < settings.COMPRESSION_MIN_SIZE:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            COMPRESSION_BYTES.inc(len(response.content), encoding=encoding, stage='original')
+            COMPRESSION_BYTES.inc(len(compressed), encoding=encoding, stage='compressed')
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # тело изменилось, поэтому сильный ETag становится слабым (как в GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
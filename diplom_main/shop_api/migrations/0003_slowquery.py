@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-19 11:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_api', '0002_alter_iteminfo_options_iteminfo_value_info_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток запроса')),
+                ('normalized_sql', models.TextField(verbose_name='Нормализованный SQL')),
+                ('example_sql', models.TextField(verbose_name='Пример запроса')),
+                ('plan', models.TextField(blank=True, verbose_name='План выполнения')),
+                ('plan_analyzed', models.BooleanField(default=False, verbose_name='План получен через EXPLAIN ANALYZE')),
+                ('call_site', models.CharField(blank=True, max_length=300, verbose_name='Место вызова')),
+                ('database', models.CharField(max_length=50, verbose_name='База данных')),
+                ('calls', models.PositiveIntegerField(default=0, verbose_name='Количество медленных выполнений')),
+                ('total_time', models.FloatField(default=0, verbose_name='Суммарное время, мс')),
+                ('max_time', models.FloatField(default=0, verbose_name='Максимальное время, мс')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые замечен')),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последний раз замечен')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_time'],
+            },
+        ),
+    ]
@@ -162,7 +162,7 @@ class VendorInfo(models.Model):
         verbose_name_plural = 'Информация о сотрудниках'
 
     def __str__(self):
-        return f'Пользователь: {self.user.email}, компания: {self.name}, ИНН: {self.inn}, адрес: {self.address.get_full_address()}'
+        return f'Пользователь: {self.user.email}, компания: {self.name}, ИНН: {self.inn}'
 
     def get_full_info(self):
         return {
@@ -198,7 +198,7 @@ class Order(models.Model):
         ]
 
     def __str__(self):
-        return f'ID заказа {self.id}. Дата создания: {self.create_at if self.created_at else 'Заказ в состоянии "Корзина;Закрыт;Доставлен"'}. Статус: {self.state}.'
+        return f'ID заказа {self.id}. Дата создания: {self.created_at if self.created_at else 'Заказ в состоянии "Корзина;Закрыт;Доставлен"'}. Статус: {self.state}.'
 
     def save(self, *args, **kwargs):
         if self.state in ['delivered', 'canceled'] and not self.closed_at:
@@ -307,3 +307,29 @@ class ItemInfo(models.Model):
     class Meta:
         verbose_name = 'Информация о товаре'
         verbose_name_plural = 'Информация о товарах'
+
+
+class SlowQuery(models.Model):
+    '''
+    Медленные запросы к БД, сгруппированные по нормализованному SQL (см. shop_api.slow_queries)
+    '''
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name='Отпечаток запроса')
+    normalized_sql = models.TextField(verbose_name='Нормализованный SQL')
+    example_sql = models.TextField(verbose_name='Пример запроса')
+    plan = models.TextField(blank=True, verbose_name='План выполнения')
+    plan_analyzed = models.BooleanField(default=False, verbose_name='План получен через EXPLAIN ANALYZE')
+    call_site = models.CharField(max_length=300, blank=True, verbose_name='Место вызова')
+    database = models.CharField(max_length=50, verbose_name='База данных')
+    calls = models.PositiveIntegerField(default=0, verbose_name='Количество медленных выполнений')
+    total_time = models.FloatField(default=0, verbose_name='Суммарное время, мс')
+    max_time = models.FloatField(default=0, verbose_name='Максимальное время, мс')
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name='Впервые замечен')
+    last_seen = models.DateTimeField(default=timezone.now, verbose_name='Последний раз замечен')
+
+    class Meta:
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+        ordering = ['-total_time']
+
+    def __str__(self):
+        return f'{self.fingerprint[:8]} ({self.calls} раз, {self.total_time:.0f} мс)'
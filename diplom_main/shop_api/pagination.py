@@ -0,0 +1,155 @@
+'''
+Пагинация без точного COUNT(*) по большим таблицам (админка и API).
+
+На PostgreSQL COUNT(*) читает все подходящие строки, что на миллионах строк занимает секунды
+на каждую страницу списка. Вместо этого берется оценка планировщика: для всей таблицы -
+pg_class.reltuples (обновляется VACUUM/ANALYZE), для запроса с условиями - число строк
+из плана EXPLAIN. Если оценка меньше COUNT_ESTIMATE_THRESHOLD, строк немного
+и они считаются точно; на других СУБД подсчет всегда точный.
+В ответах API поле count_is_exact сообщает, точное ли число count.
+Оценка может быть ниже реального числа строк (устаревшая статистика после массовой загрузки),
+поэтому при оценке страницы не ограничиваются числом count: наличие следующей страницы
+определяется чтением одной лишней строки, а count растет до числа уже увиденных строк.
+'''
+import json
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def table_estimate(queryset):
+    '''
+    Оценка числа строк таблицы модели; None - оценки нет (не PostgreSQL, таблица еще не анализировалась)
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(queryset.model._meta.db_table)])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def plan_estimate(queryset):
+    '''
+    Оценка числа строк запроса из плана EXPLAIN; None - не PostgreSQL
+    '''
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    # сортировка на число строк не влияет, а план без нее строится быстрее
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def is_whole_table(queryset):
+    query = queryset.query
+    return not query.where and not query.distinct and not query.combinator
+
+
+def estimate_count(queryset):
+    '''
+    Число объектов queryset и признак точности: (count, is_exact)
+    '''
+    query = queryset.query
+    # у среза и объединения запросов план оценивает не то, что нужно пагинации
+    if query.low_mark == 0 and query.high_mark is None and not query.combinator:
+        estimate = table_estimate(queryset) if is_whole_table(queryset) else plan_estimate(queryset)
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_THRESHOLD:
+            return estimate, False
+    return queryset.count(), True
+
+
+class EstimatedPage(Page):
+    '''
+    Страница Paginator с оценкой числа объектов: следующая страница есть, если нашлась лишняя строка
+    '''
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self.object_list) - 1 if self.object_list else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    '''
+    Paginator, который берет число объектов из estimate_count; count_is_exact - точно ли оно
+    '''
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        count, self.count_is_exact = estimate_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # за оценкой числа страниц могут быть еще строки, пустая страница выяснится в page()
+            if self.count_is_exact or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count_is_exact:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+        has_next = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not object_list and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+
+        seen = bottom + len(object_list) + int(has_next)
+        if seen > self.count:
+            self.count = seen
+            self.__dict__.pop('num_pages', None)
+        return EstimatedPage(object_list, number, self, has_next)
+
+
+class EstimatedPageNumberPagination(PageNumberPagination):
+    '''
+    Постраничный вывод списков API с оценкой числа объектов (см. estimate_count).
+    Включается параметром ?page= или ?page_size= (до max_page_size), без них список
+    отдается целиком, как раньше
+    '''
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        if self.page_query_param not in request.query_params and self.page_size_query_param not in request.query_params:
+            return None
+        return super().get_page_size(request) or settings.API_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # без сортировки страницы могут пересекаться
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_exact': self.page.paginator.count_is_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {'type': 'boolean', 'example': True}
+        return response_schema
@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .cache import user_in_groups
+
 
 class IsUserOrStaff(permissions.BasePermission):
     '''
@@ -15,10 +17,10 @@ class IsUserOrStaff(permissions.BasePermission):
 class IsUserOrInGroup(permissions.BasePermission):
     '''Проверка, обычный пользователь или определенные группы'''
     def __init__(self, groups=None):
-        self.groups = groups
+        self.groups = groups or []
 
     def has_object_permission(self, request, view, obj):
-        return request.user.groups.filter(name__in=self.group).exists() or obj.user == request.user
+        return user_in_groups(request.user, self.groups) or obj.user == request.user
 
     def has_permission(self, request, view):
         return True
@@ -29,9 +31,9 @@ class IsInGroups(permissions.BasePermission):
         self.group = group or []
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=self.group).exists()
+        return user_in_groups(request.user, self.group)
 
 
 class IsVendorOrManager(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['manager_base', 'vendor_base']).exists()
+        return user_in_groups(request.user, ['manager_base', 'vendor_base'])
@@ -0,0 +1,139 @@
+'''
+Профилирование отдельных запросов (см. ProfilingMiddleware).
+
+Режимы:
+  cprofile - детерминированный профиль cProfile, сохраняется в .pstats
+             (python -m pstats, snakeviz);
+  sampling - снимки стека потока запроса раз в PROFILING_SAMPLE_INTERVAL секунд,
+             сохраняются в .collapsed (flamegraph.pl, speedscope).
+
+cProfile в процессе может быть включен только один (в Python 3.12 второй enable() падает
+с ValueError), поэтому запрос, пришедший во время профилирования другого, профилируется в режиме sampling.
+'''
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+PROFILING_MODES = ('cprofile', 'sampling')
+PROFILE_EXTENSIONS = {'cprofile': '.pstats', 'sampling': '.collapsed'}
+
+# занят, пока в процессе работает DeterministicProfiler
+_cprofile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    '''
+    Фоновый поток периодически снимает стек профилируемого потока и считает одинаковые стеки
+    '''
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class DeterministicProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def dump(self, path):
+        self._profile.dump_stats(path)
+
+
+def make_profiler(mode):
+    if mode == 'sampling':
+        return SamplingProfiler(settings.PROFILING_SAMPLE_INTERVAL)
+    return DeterministicProfiler()
+
+
+def profile_call(mode, label, func, *args, **kwargs):
+    '''
+    Выполняет func под профилировщиком и сохраняет профиль в PROFILING_DIR.
+    Возвращает результат func и имя файла профиля (по расширению видно, какой режим использован)
+    '''
+    locked = mode == 'cprofile' and _cprofile_lock.acquire(blocking=False)
+    if mode == 'cprofile' and not locked:
+        mode = 'sampling'
+    try:
+        profiler = make_profiler(mode)
+        profiler.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            profiler.stop()
+    finally:
+        if locked:
+            _cprofile_lock.release()
+
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    file_name = f'{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}{PROFILE_EXTENSIONS[mode]}'
+    profiler.dump(os.path.join(settings.PROFILING_DIR, file_name))
+    remove_old_profiles()
+    return result, file_name
+
+
+def list_profiles():
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILING_DIR):
+        if entry.is_file() and entry.name.endswith(tuple(PROFILE_EXTENSIONS.values())):
+            stat = entry.stat()
+            profiles.append({'name': entry.name, 'size': stat.st_size, 'created_at': stat.st_mtime})
+    return sorted(profiles, key=lambda profile: profile['created_at'], reverse=True)
+
+
+def get_profile_path(name):
+    '''
+    Путь к файлу профиля по имени; None, если такого профиля нет
+    '''
+    if os.path.basename(name) != name or not name.endswith(tuple(PROFILE_EXTENSIONS.values())):
+        return None
+    path = os.path.join(settings.PROFILING_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+def remove_old_profiles():
+    for profile in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILING_DIR, profile['name']))
+        except FileNotFoundError:
+            pass
@@ -8,7 +8,11 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
-from .models import User, UserInfo, Position, StaffInfo, Address, VendorInfo, Item, Category, Order, ItemInfo
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .authentication import add_user_claims
+from .models import User, UserInfo, Position, StaffInfo, Address, VendorInfo, Item, Category, Order, OrderItem, ItemInfo
+from .sparse_fields import SparseFieldsMixin
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,6 +21,15 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class UserShortSerializer(serializers.ModelSerializer):
+    '''
+    Пользователь в раскрытых связях (?expand=): без пароля и прав
+    '''
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'first_name', 'last_name']
+
+
 class PasswordResetSerializer(serializers.Serializer):
     email = serializers.CharField()
 
@@ -104,6 +117,15 @@ class LoginSerializer(serializers.Serializer):
         return attrs
 
 
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    '''
+    Выдача пары токенов с claims пользователя для ClaimsJWTAuthentication
+    '''
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
 class UserInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserInfo
@@ -134,13 +156,21 @@ class AddressClientSerializer(serializers.ModelSerializer):
         }
 
 
-class AddressManagerSerializer(serializers.ModelSerializer):
+class AddressManagerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': (UserShortSerializer, {}),
+    }
+
     class Meta:
         model = Address
         fields = '__all__'
 
 
-class VendorInfoSerializer(serializers.ModelSerializer):
+class VendorInfoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': (UserShortSerializer, {}),
+    }
+
     class Meta:
         model = VendorInfo
         fields = '__all__'
@@ -168,7 +198,12 @@ class ItemInfoSerializer(serializers.ModelSerializer):
         fields = ['type_info', 'value_info']
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'vendor': (UserShortSerializer, {}),
+        'info': (ItemInfoSerializer, {'many': True}),
+    }
+
     categories = CategorySerializerForItem(many=True, read_only=True)
 
     info = ItemInfoSerializer(many=True, write_only=True, required=False)
@@ -181,7 +216,18 @@ class ItemSerializer(serializers.ModelSerializer):
         }
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['item', 'quantity', 'price_at_order']
+
+
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'address': (AddressClientSerializer, {}),
+        'items': (OrderItemSerializer, {'many': True, 'source': 'order_item'}),
+    }
+
     class Meta:
         model = Order
         fields = ['user', 'address', 'state', 'comment', 'total_price', 'created_at', 'updated_at', 'closed_at']
@@ -190,3 +236,18 @@ class OrderSerializer(serializers.ModelSerializer):
             'created_at': {'read_only': True, },
             'updated_at': {'read_only': True, },
         }
+
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=64)
+    method = serializers.ChoiceField(choices=BATCH_METHODS, default='GET')
+    path = serializers.RegexField(r'^/', max_length=2048)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    atomic = serializers.BooleanField(default=False)
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_OPERATIONS)
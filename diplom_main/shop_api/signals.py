@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import GROUPS_CACHE_ATTR, invalidate_user_claims, invalidate_user_groups, invalidate_all_groups
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    '''
+    Сбрасывает кэш групп при изменении user.groups / group.user_set
+    '''
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    if not reverse:
+        instance.__dict__.pop(GROUPS_CACHE_ATTR, None)
+        invalidate_user_groups(instance.pk)
+    elif pk_set:
+        invalidate_user_groups(*pk_set)
+    else:
+        # group.user_set.clear() не передает id пользователей
+        invalidate_all_groups()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    invalidate_all_groups()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    '''
+    is_staff, is_superuser и is_active есть в claims токенов: после сохранения пользователя
+    выданные ему токены аутентифицируют только через БД
+    '''
+    if not created:
+        invalidate_user_claims(instance.pk)
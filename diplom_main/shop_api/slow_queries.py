@@ -0,0 +1,276 @@
+'''
+Журнал медленных запросов к БД.
+
+Execute wrapper на всех соединениях замечает запросы дольше SLOW_QUERY_THRESHOLD_MS
+и складывает их в буфер процесса (не больше SLOW_QUERY_BUFFER_SIZE записей: при переполнении
+отбрасываются самые старые, их число видно в метрике shop_slow_queries_dropped_total).
+Фоновый поток процесса получает планы запросов через EXPLAIN (для доли SLOW_QUERY_ANALYZE_RATE
+SELECT-запросов на PostgreSQL - через EXPLAIN ANALYZE, по умолчанию выключено) и сохраняет
+их в модель SlowQuery, группируя по отпечатку нормализованного SQL. Поток просыпается
+после каждого запроса к API, в котором были медленные запросы (request_finished), и раз
+в SLOW_QUERY_FLUSH_INTERVAL секунд для фоновых задач и команд; остаток буфера сохраняется
+при завершении процесса. Ни EXPLAIN, ни запись журнала не выполняются в потоке запроса.
+Отчет: python manage.py slow_queries
+'''
+import atexit
+import contextvars
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, IntegrityError, close_old_connections, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .instrumentation import current_recorder
+from .metrics import SLOW_QUERIES_DROPPED
+
+logger = logging.getLogger(__name__)
+
+# запросы самого журнала (EXPLAIN, запись SlowQuery) не должны попадать в журнал
+capturing = contextvars.ContextVar('slow_query_capturing', default=False)
+
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'with')
+
+_pending = deque()
+_pending_lock = threading.Lock()
+_dropped = 0
+_explained_at = {}
+
+_flush_requested = threading.Event()
+_writer = None
+_writer_lock = threading.Lock()
+
+# кадры execute wrapper'ов и manage.py не считаем местом вызова
+IGNORED_MODULES = ('instrumentation.py', 'slow_queries.py', 'manage.py')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    '''
+    SQL без значений: литералы и параметры заменены на ?, списки IN (...) свернуты
+    '''
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+def find_call_site():
+    '''
+    Ближайший к запросу кадр стека из кода проекта и представление, обрабатывающее запрос
+    '''
+    base_dir = str(settings.BASE_DIR)
+    call_site = ''
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename and not frame.filename.endswith(IGNORED_MODULES):
+            call_site = f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+            break
+
+    # запросы из кода DRF (list, retrieve) не проходят через код проекта, для них остается только представление
+    recorder = current_recorder.get()
+    if recorder is not None and recorder.label:
+        call_site = f'{call_site} ({recorder.label})' if call_site else recorder.label
+    return call_site[:300]
+
+
+def explain(connection, sql, params, analyze):
+    options = {'analyze': True} if analyze else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    # EXPLAIN в точке сохранения, чтобы его ошибка не прервала транзакцию приложения
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def capture(connection, sql, params, many, duration):
+    global _dropped
+    normalized = normalize_sql(sql)
+    statement = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ''
+    entry = {
+        'fingerprint': fingerprint(normalized),
+        'normalized_sql': normalized,
+        'example_sql': sql,
+        # параметры нужны только для EXPLAIN
+        'params': params if not many and statement in EXPLAINABLE else None,
+        'statement': statement,
+        'call_site': find_call_site(),
+        'database': connection.alias,
+        'time': duration * 1000,
+    }
+    dropped = 0
+    with _pending_lock:
+        # пока журнал не успевает сохраняться (например, БД перегружена), память процесса не растет
+        while _pending and len(_pending) >= settings.SLOW_QUERY_BUFFER_SIZE:
+            _pending.popleft()
+            dropped += 1
+        _pending.append(entry)
+        _dropped += dropped
+    if dropped:
+        SLOW_QUERIES_DROPPED.inc(dropped)
+    start_writer()
+
+
+def get_plan(entry):
+    '''
+    План запроса и признак EXPLAIN ANALYZE; пустой план, если план этого запроса недавно уже получен
+    '''
+    now = time.monotonic()
+    if entry['params'] is None or now - _explained_at.get(entry['fingerprint'], -float('inf')) < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+        return '', False
+    _explained_at[entry['fingerprint']] = now
+
+    connection = connections[entry['database']]
+    # EXPLAIN ANALYZE выполняет запрос повторно, поэтому только для SELECT на PostgreSQL;
+    # WITH может содержать INSERT/UPDATE/DELETE, для него - EXPLAIN без выполнения
+    analyze = connection.vendor == 'postgresql' and entry['statement'] == 'select' and random.random() < settings.SLOW_QUERY_ANALYZE_RATE
+    try:
+        return explain(connection, entry['example_sql'], entry['params'], analyze), analyze
+    except (DatabaseError, ValueError) as e:
+        return f'EXPLAIN не выполнен: {e}', False
+
+
+def slow_query_execute(execute, sql, params, many, context):
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or capturing.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+
+    if duration * 1000 >= threshold:
+        token = capturing.set(True)
+        try:
+            capture(context['connection'], sql, params, many, duration)
+        except Exception:
+            logger.exception('Не удалось записать медленный запрос')
+        finally:
+            capturing.reset(token)
+    return result
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    if slow_query_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_execute)
+
+
+@receiver(request_finished)
+def request_flush(sender, **kwargs):
+    if _pending:
+        _flush_requested.set()
+
+
+def start_writer():
+    '''
+    Запускает фоновый поток записи журнала, если его еще нет в этом процессе (после fork потока нет)
+    '''
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name='slow-query-writer', daemon=True)
+            _writer.start()
+
+
+def _write_loop():
+    while True:
+        _flush_requested.wait(settings.SLOW_QUERY_FLUSH_INTERVAL)
+        _flush_requested.clear()
+        try:
+            flush_slow_queries()
+        except Exception:
+            logger.exception('Не удалось сохранить медленные запросы')
+        finally:
+            # поток живет дольше запросов, соединения закрываем так же, как после запроса
+            close_old_connections()
+
+
+def flush_slow_queries():
+    '''
+    Сохраняет накопленные медленные запросы в SlowQuery
+    '''
+    global _dropped
+    from .models import SlowQuery
+
+    with _pending_lock:
+        entries = list(_pending)
+        _pending.clear()
+        dropped, _dropped = _dropped, 0
+    if dropped:
+        logger.warning('Буфер медленных запросов переполнен, отброшено записей: %s', dropped)
+    if not entries:
+        return
+
+    grouped = {}
+    for entry in entries:
+        group = grouped.setdefault(entry['fingerprint'], {**entry, 'calls': 0, 'total_time': 0.0, 'max_time': 0.0})
+        group['calls'] += 1
+        group['total_time'] += entry['time']
+        group['max_time'] = max(group['max_time'], entry['time'])
+
+    token = capturing.set(True)
+    try:
+        for key, group in grouped.items():
+            group['plan'], group['plan_analyzed'] = get_plan(group)
+            changes = {
+                'calls': F('calls') + group['calls'],
+                'total_time': F('total_time') + group['total_time'],
+                'max_time': Greatest('max_time', group['max_time']),
+                'last_seen': timezone.now(),
+                'example_sql': group['example_sql'],
+                'call_site': group['call_site'],
+            }
+            if group['plan']:
+                changes.update(plan=group['plan'], plan_analyzed=group['plan_analyzed'])
+
+            if SlowQuery.objects.filter(fingerprint=key).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    SlowQuery.objects.create(
+                        fingerprint=key,
+                        normalized_sql=group['normalized_sql'],
+                        example_sql=group['example_sql'],
+                        plan=group['plan'],
+                        plan_analyzed=group['plan_analyzed'],
+                        call_site=group['call_site'],
+                        database=group['database'],
+                        calls=group['calls'],
+                        total_time=group['total_time'],
+                        max_time=group['max_time'],
+                    )
+            except IntegrityError:
+                # запись успел создать другой воркер
+                SlowQuery.objects.filter(fingerprint=key).update(**changes)
+    except DatabaseError:
+        logger.exception('Не удалось сохранить медленные запросы')
+    finally:
+        capturing.reset(token)
+
+
+# остаток буфера (например, медленные запросы команды manage.py) сохраняем при завершении процесса
+atexit.register(flush_slow_queries)
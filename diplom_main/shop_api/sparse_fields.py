@@ -0,0 +1,125 @@
+'''
+Выборочные поля и раскрытие связей в ответах: ?fields=id,name,price и ?expand=info.
+
+SparseFieldsMixin (для сериализатора) оставляет в ответе только перечисленные поля
+и добавляет раскрытые связи из expandable_fields. SparseFieldsViewMixin (для представления)
+сужает queryset под итоговый набор полей: only() по столбцам, select_related
+для раскрытых внешних ключей и prefetch_related только для запрошенных связей.
+Без параметров ответ и запросы к БД не меняются. Неизвестные имена в ?fields= - ошибка 400
+со списком этих имен, неизвестные связи в ?expand= игнорируются.
+'''
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField
+
+
+def parse_names(request, param):
+    value = request.query_params.get(param) if request is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_fields(request):
+    '''
+    Поля из ?fields=; None - параметр не передан
+    '''
+    return parse_names(request, 'fields')
+
+
+def requested_expand(request):
+    return parse_names(request, 'expand') or set()
+
+
+def validate_requested_fields(names, field_names, expandable_fields):
+    unknown = sorted(names - set(field_names) - set(expandable_fields))
+    if unknown:
+        raise ValidationError({'fields': f'Неизвестные поля: {", ".join(unknown)}.'})
+
+
+class SparseFieldsMixin:
+    '''
+    Примесь к ModelSerializer. expandable_fields: {имя: (класс сериализатора, аргументы)}
+    '''
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        # параметры относятся только к корневому сериализатору ответа
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        if parent is not None:
+            return fields
+
+        expand = requested_expand(request) & set(self.expandable_fields)
+        for name in expand:
+            serializer_class, kwargs = self.expandable_fields[name]
+            fields[name] = serializer_class(read_only=True, **kwargs)
+
+        names = requested_fields(request)
+        if names is not None:
+            validate_requested_fields(names, [name for name, field in fields.items() if not field.write_only], self.expandable_fields)
+            for name in list(fields):
+                if name not in names and name not in expand:
+                    fields.pop(name)
+        return fields
+
+
+def narrow_queryset(queryset, serializer):
+    '''
+    queryset, загружающий только то, что нужно полям сериализатора.
+    Если поле берет данные не из поля модели (метод, свойство), queryset не меняется
+    '''
+    model = queryset.model
+    only = {model._meta.pk.name}
+    select_related = []
+    prefetches = []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return queryset
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return queryset
+
+        if model_field.many_to_many or model_field.one_to_many:
+            related = model_field.related_model.objects.order_by('pk')
+            # для списка pk объекты связи целиком не нужны
+            if isinstance(field, ManyRelatedField):
+                related = related.only('pk')
+            prefetches.append(Prefetch(field.source, queryset=related))
+        elif model_field.concrete:
+            only.add(field.source)
+            if model_field.is_relation and isinstance(field, serializers.BaseSerializer):
+                select_related.append(field.source)
+        else:
+            return queryset
+
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches).only(*only)
+    # select_related() без аргументов присоединил бы все внешние ключи
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    return queryset
+
+
+class SparseFieldsViewMixin:
+    '''
+    Примесь к ModelViewSet: сужает queryset list и retrieve под ?fields= и ?expand=
+    '''
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        request = self.request
+        if request.method not in SAFE_METHODS or self.action not in ('list', 'retrieve'):
+            return queryset
+        if requested_fields(request) is None and not requested_expand(request):
+            return queryset
+        return narrow_queryset(queryset, self.get_serializer())
@@ -0,0 +1,89 @@
+'''
+Общие фикстуры тестов: пользователи, клиенты API с JWT и небольшой каталог товаров
+'''
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from shop_api.authentication import get_tokens_for_user
+from shop_api.models import Address, Category, Item, ItemInfo, User, VendorInfo
+
+PASSWORD = 'Sl0zhny-Parol'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # кэш групп и закрепления за основной БД не должен переходить из теста в тест
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(email, groups=(), **extra_fields):
+        extra_fields.setdefault('is_active', True)
+        user = User.objects.create_user(first_name='Иван', last_name='Иванов', email=email, password=PASSWORD, **extra_fields)
+        for name in groups:
+            user.groups.add(Group.objects.get_or_create(name=name)[0])
+        return user
+    return make_user
+
+
+@pytest.fixture
+def auth_client():
+    '''
+    Клиент API с access-токеном пользователя, выданным так же, как при входе
+    '''
+    def auth_client(user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_tokens_for_user(user).access_token}')
+        return client
+    return auth_client
+
+
+@pytest.fixture
+def vendor(make_user):
+    user = make_user('vendor@diplom.com', groups=['vendor_base'])
+    VendorInfo.objects.create(user=user, name='ООО Тест', inn='7700000000')
+    return user
+
+
+@pytest.fixture
+def customer(make_user):
+    return make_user('customer@diplom.com', groups=['client_base'])
+
+
+@pytest.fixture
+def manager(make_user):
+    return make_user('manager@diplom.com', groups=['manager_base'])
+
+
+@pytest.fixture
+def address(customer):
+    return Address.objects.create(user=customer, city='Москва', street='Тестовая', house='1', appartment=1)
+
+
+@pytest.fixture
+def catalog(vendor):
+    '''
+    Пять товаров в двух категориях; у последнего товара нет ни категорий, ни характеристик
+    '''
+    categories = [Category.objects.create(name=f'Категория {number}') for number in range(2)]
+    items = [
+        Item.objects.create(name=f'Товар {number}', vendor=vendor, price=Decimal('100.50') + number, quantity=10 + number)
+        for number in range(5)
+    ]
+    for number, item in enumerate(items[:-1]):
+        item.categories.add(categories[number % 2])
+        ItemInfo.objects.create(item=item, type_info='Цвет', value_info='Черный')
+    categories[0].items.add(items[1])
+    return {'categories': categories, 'items': items}
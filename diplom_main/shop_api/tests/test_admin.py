@@ -0,0 +1,70 @@
+'''
+Списки админки больших таблиц: число запросов к БД не зависит от числа строк,
+строки за пределами оценки числа объектов доступны (см. shop_api.admin, shop_api.pagination)
+'''
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shop_api import pagination
+from shop_api.admin import ItemAdmin
+from shop_api.models import Item, ItemInfo, Order, OrderItem, VendorInfo
+
+pytestmark = pytest.mark.django_db
+
+CHANGELISTS = ['item', 'order', 'orderitem', 'iteminfo']
+# фиксированное число запросов на страницу списка, без запроса на каждую строку
+CHANGELIST_QUERIES = 5
+
+
+@pytest.fixture
+def admin_client(client, make_user):
+    client.force_login(make_user('admin@diplom.com', is_staff=True, is_superuser=True))
+    return client
+
+
+@pytest.fixture
+def add_vendor(make_user, customer):
+    '''
+    Поставщик с двумя товарами, характеристиками и заказом на оба товара
+    '''
+    def add_vendor(number):
+        vendor = make_user(f'vendor{number}@diplom.com', groups=['vendor_base'])
+        VendorInfo.objects.create(user=vendor, name=f'ООО Поставщик {number}', inn=f'77000000{number:02}')
+        order = Order.objects.create(user=customer)
+        for item_number in range(2):
+            item = Item.objects.create(name=f'Товар {number}-{item_number}', vendor=vendor, price=Decimal('10.00'), quantity=5)
+            ItemInfo.objects.create(item=item, type_info='Цвет', value_info='Черный')
+            OrderItem.objects.create(order=order, item=item, quantity=1)
+    return add_vendor
+
+
+def changelist_queries(client, model):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f'/admin/shop_api/{model}/')
+    assert response.status_code == 200
+    return len(queries)
+
+
+@pytest.mark.parametrize('model', CHANGELISTS)
+def test_changelist_query_count_does_not_grow_with_rows(admin_client, add_vendor, model):
+    for number in range(3):
+        add_vendor(number)
+    assert changelist_queries(admin_client, model) == CHANGELIST_QUERIES
+    for number in range(3, 6):
+        add_vendor(number)
+    assert changelist_queries(admin_client, model) == CHANGELIST_QUERIES
+
+
+def test_changelist_reaches_rows_beyond_low_estimate(admin_client, catalog, settings, monkeypatch):
+    # оценка занижена: 3 строки вместо 5, по 2 на странице
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    monkeypatch.setattr(pagination, 'table_estimate', lambda queryset: 3)
+    monkeypatch.setattr(ItemAdmin, 'list_per_page', 2)
+    response = admin_client.get('/admin/shop_api/item/', {'p': 3})
+    assert response.status_code == 200
+    changelist = response.context['cl']
+    assert [item.id for item in changelist.result_list] == [catalog['items'][4].id]
+    assert changelist.paginator.num_pages == 3
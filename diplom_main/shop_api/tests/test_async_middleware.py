@@ -0,0 +1,57 @@
+'''
+Middleware проекта под ASGI работают без переключения потоков: хуки вызываются в цикле событий
+'''
+import pytest
+from asgiref.sync import SyncToAsync, async_to_sync, iscoroutinefunction
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient
+
+from shop_api.authentication import get_tokens_for_user
+
+pytestmark = pytest.mark.django_db
+
+
+def test_project_hooks_are_not_run_in_threads(settings):
+    settings.PROFILING_ENABLED = True
+    handler = ASGIHandler()
+    threaded = [
+        method.func for method in handler._view_middleware + handler._template_response_middleware + handler._exception_middleware
+        if isinstance(method, SyncToAsync)
+    ]
+    assert [func for func in threaded if type(func.__self__).__module__ == 'shop_api.middleware'] == []
+
+    project_view_hooks = [method for method in handler._view_middleware if getattr(method, '__self__', None) is not None and type(method.__self__).__module__ == 'shop_api.middleware']
+    assert len(project_view_hooks) == 4
+    assert all(iscoroutinefunction(method) for method in project_view_hooks)
+
+
+def test_async_view_through_middleware(settings, catalog):
+    settings.DEBUG = True
+    response = async_to_sync(AsyncClient().get)('/api/async/items/')
+    assert response.status_code == 200
+    assert len(response.json()) == len(catalog['items'])
+    # счетчик запросов QueryInstrumentationMiddleware видит запросы асинхронного ORM
+    assert int(response['X-DB-Query-Count']) == 2
+
+
+def test_sync_view_under_asgi(settings, catalog):
+    settings.DEBUG = True
+    response = async_to_sync(AsyncClient().get)('/api/items//')
+    assert response.status_code == 200
+    assert int(response['X-DB-Query-Count']) == 2
+
+
+def test_profiling_under_asgi(settings, make_user, catalog, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = str(tmp_path)
+    admin = make_user('admin@diplom.com', is_staff=True)
+    headers = {'Authorization': f'Bearer {get_tokens_for_user(admin).access_token}'}
+
+    client = AsyncClient()
+    response = async_to_sync(client.get)('/api/items//', {'profile': 'sampling'}, headers=headers)
+    assert response.status_code == 200
+    assert (tmp_path / response['X-Profile-File']).exists()
+
+    # без запроса профиля представление вызывается обычным образом
+    response = async_to_sync(client.get)('/api/items//', headers=headers)
+    assert response.status_code == 200 and 'X-Profile-File' not in response
@@ -0,0 +1,78 @@
+'''
+Аутентификация по claims JWT: безопасные запросы обходятся без загрузки пользователя из БД,
+пока группы и флаги пользователя не изменились после выдачи токена
+'''
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+USER_TABLE = '"shop_api_user"'
+
+
+def user_queries(queries):
+    return [query['sql'] for query in queries if f'FROM {USER_TABLE}' in query['sql']]
+
+
+def test_safe_request_uses_claims(manager, auth_client):
+    client = auth_client(manager)
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/order//')
+    assert response.status_code == 200
+    assert user_queries(queries) == []
+
+
+def test_write_request_loads_user(manager, auth_client, catalog):
+    client = auth_client(manager)
+    with CaptureQueriesContext(connection) as queries:
+        client.post('/api/categories//', {'name': 'Новая категория'}, format='json')
+    assert user_queries(queries)
+
+
+def test_removed_group_is_not_trusted_from_claims(manager, auth_client):
+    client = auth_client(manager)
+    assert client.get('/api/order//').status_code == 200
+
+    manager.groups.remove(Group.objects.get(name='manager_base'))
+
+    assert client.get('/api/order//').status_code == 403
+
+
+def test_deleted_group_is_not_trusted_from_claims(manager, auth_client):
+    client = auth_client(manager)
+    assert client.get('/api/order//').status_code == 200
+
+    Group.objects.get(name='manager_base').delete()
+
+    assert client.get('/api/order//').status_code == 403
+
+
+def test_revoked_staff_is_not_trusted_from_claims(make_user, auth_client):
+    admin = make_user('admin@diplom.com', is_staff=True)
+    client = auth_client(admin)
+    assert client.get('/api/internal/query-report/').status_code == 200
+
+    admin.is_staff = False
+    admin.save()
+
+    assert client.get('/api/internal/query-report/').status_code == 403
+
+
+def test_new_token_uses_claims_again(manager, auth_client):
+    manager.groups.remove(Group.objects.get(name='manager_base'))
+    manager.groups.add(Group.objects.get(name='manager_base'))
+
+    client = auth_client(manager)
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get('/api/order//').status_code == 200
+    assert user_queries(queries) == []
+
+
+def test_expired_claims_load_user(manager, auth_client, settings):
+    settings.JWT_CLAIMS_MAX_AGE = 0
+    client = auth_client(manager)
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get('/api/order//').status_code == 200
+    assert user_queries(queries)
@@ -0,0 +1,85 @@
+'''
+Пакетное выполнение запросов (POST /api/batch/, см. shop_api.batch)
+'''
+from decimal import Decimal
+
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def batch(client, operations, atomic=False):
+    response = client.post('/api/batch/', {'atomic': atomic, 'operations': operations}, format='json')
+    assert response.status_code == 200
+    return response.json()
+
+
+def change_price(item, price, operation_id=None):
+    operation = {'method': 'PATCH', 'path': f'/api/items//{item.id}/change_price/', 'body': {'price': price}}
+    if operation_id is not None:
+        operation['id'] = operation_id
+    return operation
+
+
+def test_operations_run_in_order(catalog, vendor, auth_client):
+    item = catalog['items'][0]
+    data = batch(auth_client(vendor), [
+        change_price(item, '90.00', 'change'),
+        {'id': 'read', 'method': 'GET', 'path': f'/api/items//{item.id}/?fields=id,price'},
+    ])
+    assert data['status'] == 'success'
+    assert data['results'] == [
+        {'id': 'change', 'status': 200, 'body': {'status': 'success'}},
+        # операция видит изменения предыдущей
+        {'id': 'read', 'status': 200, 'body': {'id': item.id, 'price': '90.00'}},
+    ]
+
+
+def test_partial_success_without_atomic(catalog, vendor, auth_client):
+    item = catalog['items'][0]
+    data = batch(auth_client(vendor), [
+        change_price(item, '90.00'),
+        change_price(item, 'дорого'),
+        {'method': 'GET', 'path': '/api/unknown/'},
+    ])
+    assert data['status'] == 'partial_success'
+    assert [result['status'] for result in data['results']] == [200, 400, 404]
+    item.refresh_from_db()
+    assert item.price == Decimal('90.00')
+
+
+def test_atomic_batch_rolls_back_and_skips_the_rest(catalog, vendor, auth_client):
+    first, second = catalog['items'][:2]
+    data = batch(auth_client(vendor), [
+        change_price(first, '90.00'),
+        change_price(second, 'дорого'),
+        change_price(second, '80.00'),
+    ], atomic=True)
+    assert data['status'] == 'error'
+    assert [result['status'] for result in data['results']] == [200, 400, 424]
+    assert data['results'][2]['body'] == {'detail': 'Не выполнено: предыдущая операция завершилась ошибкой.'}
+
+    # успешная первая операция откачена вместе со всем пакетом
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.price, second.price) == (Decimal('100.50'), Decimal('101.50'))
+
+
+def test_atomic_batch_commits_when_all_succeed(catalog, vendor, auth_client):
+    first, second = catalog['items'][:2]
+    data = batch(auth_client(vendor), [change_price(first, '90.00'), change_price(second, '80.00')], atomic=True)
+    assert data['status'] == 'success'
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.price, second.price) == (Decimal('90.00'), Decimal('80.00'))
+
+
+@pytest.mark.parametrize('path', ['/api/batch/', '/api/async/items/'])
+def test_unbatchable_views_are_rejected(customer, auth_client, path):
+    data = batch(auth_client(customer), [{'method': 'GET', 'path': path}])
+    assert data['results'] == [{'status': 400, 'body': {'detail': 'Этот запрос нельзя выполнить в пакете.'}}]
+
+
+def test_invalid_batch(customer, auth_client):
+    response = auth_client(customer).post('/api/batch/', {'operations': [{'method': 'TRACE', 'path': '/api/items//'}]}, format='json')
+    assert response.status_code == 400
@@ -0,0 +1,85 @@
+'''
+Микробенчмарки shop_api.microbench как регрессионный гейт: тест падает, если время вызова
+(минимум по раундам) превышает порог из THRESHOLDS_MS или быстрая реализация
+перестает опережать обычную во столько раз, сколько указано в SPEEDUPS.
+
+Пороги взяты с запасом примерно в 3 раза от замеров на машине разработчика
+(python manage.py microbench): гейт ловит заметные замедления, а не шум.
+Подробный отчет и сравнение с baseline конкретной машины - manage.py microbench --baseline.
+В обычном прогоне pytest бенчмарки исключены (addopts в pytest.ini), запуск: python -m pytest -m benchmark
+'''
+import pytest
+from django.db import transaction
+
+from shop_api.microbench import BENCHMARKS, BenchmarkSkipped, Fixtures, run_benchmark
+
+pytestmark = pytest.mark.benchmark
+
+# мс на вызов
+THRESHOLDS_MS = {
+    'item_serializer': 200,
+    'fast_item_serializer': 20,
+    'order_serializer': 15,
+    'fast_order_serializer': 3,
+    'json_render_drf': 30,
+    'json_render_fast': 10,
+    'json_parse_drf': 20,
+    'json_parse_fast': 10,
+    'register_validation': 6,
+    'csv_row_parsing': 600,
+    'invoice_pdf': 1500,
+}
+
+# быстрая реализация: (обычная, во сколько раз быстрее как минимум)
+# цель - ускорение не меньше 5 раз на странице из 1000 товаров; список заказов короче,
+# доля неизменной работы в нем больше, на нем замерено 4.5-5 раз
+SPEEDUPS = {
+    'fast_item_serializer': ('item_serializer', 5),
+    'fast_order_serializer': ('order_serializer', 4),
+    'json_render_fast': ('json_render_drf', 2),
+    'json_parse_fast': ('json_parse_drf', 1.2),
+}
+
+ROUNDS = 5
+WARMUP = 1
+MIN_TIME = 0.05
+
+
+@pytest.fixture(scope='module')
+def fixtures(django_db_setup, django_db_blocker):
+    # объекты создаются один раз на модуль и удаляются откатом транзакции
+    with django_db_blocker.unblock(), transaction.atomic():
+        yield Fixtures()
+        transaction.set_rollback(True)
+
+
+@pytest.fixture(scope='module')
+def measure(fixtures):
+    results = {}
+
+    def measure(name):
+        if name not in results:
+            try:
+                func = BENCHMARKS[name](fixtures)
+            except BenchmarkSkipped as e:
+                pytest.skip(str(e))
+            results[name] = run_benchmark(func, ROUNDS, WARMUP, MIN_TIME)
+        return results[name]
+    return measure
+
+
+def test_thresholds_cover_all_benchmarks():
+    assert set(THRESHOLDS_MS) == set(BENCHMARKS)
+
+
+@pytest.mark.parametrize('name', list(BENCHMARKS))
+def test_benchmark_threshold(measure, name):
+    result = measure(name)
+    assert result['min_ms'] <= THRESHOLDS_MS[name], f'{name}: {result["min_ms"]} мс при пороге {THRESHOLDS_MS[name]} мс'
+
+
+@pytest.mark.parametrize('name', list(SPEEDUPS))
+def test_fast_implementation_speedup(measure, name):
+    baseline_name, speedup = SPEEDUPS[name]
+    fast, baseline = measure(name)['min_ms'], measure(baseline_name)['min_ms']
+    assert fast * speedup <= baseline, f'{name}: {fast} мс, {baseline_name}: {baseline} мс, ожидалось ускорение в {speedup} раза'
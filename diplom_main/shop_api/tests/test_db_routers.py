@@ -0,0 +1,85 @@
+'''
+Чтения помеченных представлений идут на реплику, а после записи клиент закрепляется за основной БД.
+Реплика в тестах - отдельная база replica_1 (см. diplom_main/test_settings.py): объекты,
+созданные тестом в default, в ней не видны, поэтому по ответу видно, откуда он прочитан
+'''
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from shop_api import db_routers
+from shop_api.db_routers import REPLICA_PIN_COOKIE
+from shop_api.models import Item
+
+pytestmark = pytest.mark.django_db(databases=['default', 'replica_1'])
+
+
+@pytest.fixture(scope='module', autouse=True)
+def replica_schema(django_db_setup, django_db_blocker):
+    # без роутера migrate создает в реплике те же таблицы, что в default
+    with django_db_blocker.unblock(), override_settings(DATABASE_ROUTERS=[]):
+        call_command('migrate', database='replica_1', verbosity=0)
+
+
+@pytest.fixture(autouse=True)
+def replica(settings):
+    settings.REPLICA_ALIASES = ['replica_1']
+    db_routers._replica_health.clear()
+    yield
+    db_routers._replica_health.clear()
+
+
+@pytest.fixture
+def item(vendor):
+    return Item.objects.create(name='Товар', vendor=vendor, price=Decimal('100.00'), quantity=1)
+
+
+def item_ids(client):
+    response = client.get('/api/items//')
+    assert response.status_code == 200
+    return [row['id'] for row in response.json()]
+
+
+def test_safe_reads_go_to_replica(item):
+    assert item_ids(APIClient()) == []
+    assert Item.objects.using('replica_1').count() == 0
+
+
+def test_write_pins_client_to_primary(item, vendor, auth_client):
+    client = auth_client(vendor)
+    assert item_ids(client) == []
+
+    response = client.patch(f'/api/items//{item.id}/change_price/', {'price': '90.00'}, format='json')
+    assert response.status_code == 200
+    assert response.cookies[REPLICA_PIN_COOKIE]['max-age'] == 10
+    assert item_ids(client) == [item.id]
+
+    # закрепление хранится у клиента, а не в процессе: другие клиенты по-прежнему читают с реплики
+    assert item_ids(APIClient()) == []
+
+
+def test_failed_write_does_not_pin(item, customer, auth_client):
+    client = auth_client(customer)
+    response = client.patch(f'/api/items//{item.id}/change_price/', {'price': '90.00'}, format='json')
+    assert response.status_code == 403
+    assert REPLICA_PIN_COOKIE not in response.cookies
+    assert item_ids(client) == []
+
+
+def test_forged_pin_cookie_is_ignored(item):
+    client = APIClient()
+    client.cookies[REPLICA_PIN_COOKIE] = '1'
+    assert item_ids(client) == []
+
+
+def test_unhealthy_replica_falls_back_to_primary(item, settings):
+    settings.REPLICA_MAX_LAG = -1
+    assert item_ids(APIClient()) == [item.id]
+
+
+def test_without_replicas_reads_primary(item, settings):
+    settings.REPLICA_ALIASES = []
+    assert item_ids(APIClient()) == [item.id]
@@ -0,0 +1,72 @@
+'''
+Ответы FastSerializer должны совпадать с DRF-сериализаторами побайтно:
+списки товаров, категорий и заказов отдаются быстрым сериализатором, а отдельные объекты - DRF
+'''
+from decimal import Decimal
+
+import pytest
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from shop_api.fast_serializers import fast_category_serializer, fast_item_serializer, fast_order_serializer
+from shop_api.models import Category, Item, Order, OrderItem
+from shop_api.serializers import CategorySerializer, ItemSerializer, OrderSerializer
+
+pytestmark = pytest.mark.django_db
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+def assert_parity(fast_serializer, serializer_class, queryset):
+    expected = serializer_class(queryset, many=True).data
+    actual = fast_serializer.serialize(queryset)
+    assert actual == expected
+    assert render(actual) == render(expected)
+
+
+def test_item_parity(catalog):
+    # у последнего товара каталога нет категорий
+    queryset = Item.objects.order_by('id').prefetch_related(Prefetch('categories', queryset=Category.objects.order_by('id')))
+    assert_parity(fast_item_serializer, ItemSerializer, queryset)
+    assert fast_item_serializer.serialize(queryset)[-1]['categories'] == []
+
+
+def test_item_parity_with_extreme_values(vendor):
+    Item.objects.create(name='Дорогой товар', vendor=vendor, price=Decimal('99999999.99'), quantity=0, is_active=False)
+    Item.objects.create(name='Бесплатный товар', vendor=vendor, price=Decimal('0'), quantity=1)
+    assert_parity(fast_item_serializer, ItemSerializer, Item.objects.order_by('id'))
+
+
+def test_item_parity_for_selected_fields(catalog):
+    names = {'id', 'price', 'categories'}
+    queryset = Item.objects.order_by('id').prefetch_related(Prefetch('categories', queryset=Category.objects.order_by('id')))
+    expected = [{name: value for name, value in row.items() if name in names} for row in ItemSerializer(queryset, many=True).data]
+    assert fast_item_serializer.only(names).serialize(queryset) == expected
+
+
+def test_category_parity(catalog):
+    Category.objects.create(name='Пустая категория')
+    queryset = Category.objects.order_by('id').prefetch_related(Prefetch('items', queryset=Item.objects.order_by('id').only('id')))
+    assert_parity(fast_category_serializer, CategorySerializer, queryset)
+    assert fast_category_serializer.serialize(queryset)[-1]['items'] == []
+
+
+def test_order_parity(customer, address, catalog):
+    # заказ без адреса и комментария - внешний ключ и поля со значением null
+    Order.objects.create(user=customer)
+    order = Order.objects.create(user=customer, address=address, state='created', comment='Позвонить заранее', total_price=Decimal('201.00'))
+    OrderItem.objects.create(order=order, item=catalog['items'][0], quantity=2)
+    delivered = Order.objects.create(user=customer, address=address, state='delivered', total_price=Decimal('1.10'))
+    assert delivered.closed_at is not None
+
+    queryset = Order.objects.order_by('id')
+    assert_parity(fast_order_serializer, OrderSerializer, queryset)
+    data = fast_order_serializer.serialize(queryset)
+    assert data[0]['address'] is None and data[0]['comment'] is None and data[0]['closed_at'] is None
+    assert data[0]['state'] == 'basket'
+
+
+def test_empty_queryset(db):
+    assert fast_item_serializer.serialize(Item.objects.none()) == []
@@ -0,0 +1,39 @@
+'''
+Генерация набора данных (shop_api/management/commands/generate_data.py)
+'''
+import io
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from shop_api.models import Address, Category, Item, ItemInfo, Order, OrderItem
+
+pytestmark = pytest.mark.django_db
+
+User = get_user_model()
+
+
+def generate(**options):
+    call_command('generate_data', users=5, vendors=2, items=20, categories=3, orders=15, batch_size=7, stdout=io.StringIO(), **options)
+    return {
+        model: list(model.objects.order_by('id').values_list())
+        for model in (User, Address, Item, ItemInfo, Category, Category.items.through, Order, OrderItem)
+    }
+
+
+def clear():
+    OrderItem.objects.all().delete()
+    Order.objects.all().delete()
+    Category.objects.all().delete()
+    Item.objects.all().delete()
+    User.objects.all().delete()
+
+
+def test_same_seed_gives_same_data():
+    first = generate(seed=7)
+    assert len(first[Item]) == 20 and len(first[Order]) >= 15
+    clear()
+    assert generate(seed=7) == first
+    clear()
+    assert generate(seed=8)[Item] != first[Item]
@@ -0,0 +1,108 @@
+'''
+Постраничный вывод с оценкой числа строк (shop_api.pagination)
+'''
+import pytest
+from django.db import connection
+
+from shop_api import pagination
+from shop_api.models import Item
+from shop_api.pagination import EstimatedCountPaginator, estimate_count
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def analyzed(catalog):
+    # статистика планировщика по таблице товаров, ANALYZE выполняется в транзакции теста
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE shop_api_item')
+    return catalog
+
+
+def test_list_without_page_is_not_paginated(catalog, api_client):
+    response = api_client.get('/api/items//')
+    assert response.status_code == 200
+    assert len(response.json()) == len(catalog['items'])
+
+
+def test_small_table_is_counted_exactly(catalog, api_client):
+    response = api_client.get('/api/items//', {'page': 1, 'page_size': 2})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data['count'], data['count_is_exact']) == (5, True)
+    assert [row['id'] for row in data['results']] == [item.id for item in catalog['items'][:2]]
+    assert data['next'].endswith('page=2&page_size=2') and data['previous'] is None
+
+
+def test_page_size_defaults_to_setting(settings, catalog, api_client):
+    settings.API_PAGE_SIZE = 3
+    data = api_client.get('/api/items//', {'page': 2}).json()
+    assert [row['id'] for row in data['results']] == [item.id for item in catalog['items'][3:]]
+
+
+def test_large_table_count_is_estimated(settings, analyzed, api_client):
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    data = api_client.get('/api/items//', {'page': 1}).json()
+    # reltuples после ANALYZE совпадает с числом строк, но COUNT(*) не выполнялся
+    assert (data['count'], data['count_is_exact']) == (5, False)
+    assert len(data['results']) == 5
+
+
+def test_filtered_count_is_estimated_from_plan(settings, analyzed, api_client):
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    category = analyzed['categories'][0]
+    data = api_client.get('/api/items//', {'page': 1, 'category': category.id}).json()
+    assert data['count_is_exact'] is False
+    assert data['count'] >= 1
+    assert {row['id'] for row in data['results']} == set(category.items.values_list('id', flat=True))
+
+
+@pytest.fixture
+def stale_estimate(settings, catalog, monkeypatch):
+    # статистика не обновлена после загрузки: по оценке строк меньше, чем в таблице
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    monkeypatch.setattr(pagination, 'table_estimate', lambda queryset: 3)
+    return catalog
+
+
+def test_low_estimate_does_not_hide_rows(stale_estimate, api_client):
+    ids, url, pages = [], '/api/items//?page=1&page_size=2', 0
+    while url:
+        data = api_client.get(url).json()
+        assert data['count_is_exact'] is False
+        ids.extend(row['id'] for row in data['results'])
+        url, pages = data['next'], pages + 1
+    assert pages == 3
+    assert ids == [item.id for item in stale_estimate['items']]
+    # count растет до числа увиденных строк
+    assert data['count'] == 5
+
+    assert api_client.get('/api/items//', {'page': 4, 'page_size': 2}).status_code == 404
+
+
+def test_low_estimate_paginator_pages(stale_estimate):
+    paginator = EstimatedCountPaginator(Item.objects.order_by('pk'), 2)
+    page = paginator.page(3)
+    assert [item.id for item in page] == [stale_estimate['items'][4].id]
+    assert (page.has_next(), page.has_previous(), page.start_index(), page.end_index()) == (False, True, 5, 5)
+    assert paginator.page(2).has_next() is True
+    assert paginator.num_pages == 3
+
+
+def test_estimate_below_threshold_is_exact(analyzed):
+    assert estimate_count(Item.objects.all()) == (5, True)
+
+
+def test_sliced_queryset_is_counted_exactly(settings, analyzed):
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    assert estimate_count(Item.objects.all()[:2]) == (2, True)
+
+
+def test_admin_changelist_uses_estimate(settings, analyzed, client, make_user):
+    settings.COUNT_ESTIMATE_THRESHOLD = 1
+    client.force_login(make_user('admin@diplom.com', is_staff=True, is_superuser=True))
+    response = client.get('/admin/shop_api/item/')
+    assert response.status_code == 200
+    assert response.context['cl'].paginator.count_is_exact is False
+    assert response.context['cl'].result_count == 5
+
@@ -0,0 +1,70 @@
+'''
+Профилирование запросов (ProfilingMiddleware, shop_api.profiling)
+'''
+import os
+import threading
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from shop_api.middleware import ProfilingMiddleware
+from shop_api.profiling import profile_call
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = str(tmp_path)
+    return tmp_path
+
+
+def staff_request(mode):
+    request = RequestFactory().get('/', {'profile': mode})
+    request.user = type('Staff', (), {'is_authenticated': True, 'is_staff': True})()
+    return request
+
+
+def test_concurrent_cprofile_requests(profiling):
+    # оба запроса находятся в представлении одновременно: cProfile достается одному, второй профилируется сэмплированием
+    barrier = threading.Barrier(2, timeout=10)
+
+    def view(request):
+        barrier.wait()
+        return HttpResponse('ok')
+
+    middleware = ProfilingMiddleware(lambda request: HttpResponse())
+    responses, errors = [], []
+
+    def run():
+        try:
+            responses.append(middleware.process_view(staff_request('cprofile'), view, (), {}))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert [response.content for response in responses] == [b'ok', b'ok']
+    files = sorted(os.path.splitext(response['X-Profile-File'])[1] for response in responses)
+    assert files == ['.collapsed', '.pstats']
+    assert sorted(os.path.splitext(name)[1] for name in os.listdir(profiling)) == files
+
+
+def test_cprofile_is_available_after_fallback(profiling):
+    _, first = profile_call('cprofile', 'test', lambda: profile_call('cprofile', 'nested', lambda: None))
+    _, second = profile_call('cprofile', 'test', lambda: None)
+    assert first.endswith('.pstats') and second.endswith('.pstats')
+
+
+def test_anonymous_request_is_not_profiled(profiling):
+    request = RequestFactory().get('/', {'profile': 'cprofile'})
+    request.user = AnonymousUser()
+    middleware = ProfilingMiddleware(lambda request: HttpResponse())
+    assert middleware.process_view(request, lambda request: HttpResponse('ok'), (), {}) is None
+    assert os.listdir(profiling) == []
@@ -0,0 +1,36 @@
+'''
+Бюджеты запросов к БД (query_budgets представлений, см. shop_api.instrumentation)
+'''
+import logging
+
+import pytest
+
+from shop_api.instrumentation import QueryBudgetExceeded
+from shop_api.views import ItemView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def enforce(settings):
+    settings.QUERY_BUDGETS_ENFORCE = True
+
+
+def test_view_within_budget_passes(enforce, catalog, api_client):
+    response = api_client.get('/api/items//', {'page': 1, 'expand': 'info'})
+    assert response.status_code == 200
+
+
+def test_view_over_budget_fails(enforce, catalog, api_client, monkeypatch):
+    # список товаров - запрос товаров и запрос категорий, при бюджете 1 второй запрос лишний
+    monkeypatch.setattr(ItemView, 'query_budgets', {'list': 1})
+    with pytest.raises(QueryBudgetExceeded, match=r'ItemView\.list: 2 запросов к БД при бюджете 1'):
+        api_client.get('/api/items//')
+
+
+def test_view_over_budget_logs_without_enforce(catalog, api_client, monkeypatch, caplog):
+    monkeypatch.setattr(ItemView, 'query_budgets', {'list': 1})
+    with caplog.at_level(logging.WARNING, logger='shop_api.instrumentation'):
+        response = api_client.get('/api/items//')
+    assert response.status_code == 200
+    assert 'ItemView.list: 2 запросов к БД при бюджете 1' in caplog.text
@@ -0,0 +1,76 @@
+'''
+Журнал медленных запросов (shop_api.slow_queries)
+'''
+import logging
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shop_api import slow_queries
+from shop_api.models import SlowQuery
+
+
+@pytest.fixture(autouse=True)
+def journal(settings):
+    settings.SLOW_QUERY_THRESHOLD_MS = 0.001
+    slow_queries.flush_slow_queries()
+    slow_queries._explained_at.clear()
+    yield
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    with slow_queries._pending_lock:
+        slow_queries._pending.clear()
+        slow_queries._dropped = 0
+
+
+@pytest.mark.django_db
+def test_buffer_keeps_newest_entries(settings, monkeypatch, caplog):
+    monkeypatch.setattr(slow_queries, 'start_writer', lambda: None)
+    settings.SLOW_QUERY_BUFFER_SIZE = 2
+    for number in range(3):
+        slow_queries.capture(connection, f'SELECT {number} AS "column_{number}"', (), False, 1)
+    assert [entry['example_sql'] for entry in slow_queries._pending] == ['SELECT 1 AS "column_1"', 'SELECT 2 AS "column_2"']
+
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    with caplog.at_level(logging.WARNING, logger='shop_api.slow_queries'):
+        slow_queries.flush_slow_queries()
+    assert 'отброшено записей: 1' in caplog.text
+    assert sorted(SlowQuery.objects.values_list('example_sql', flat=True)) == ['SELECT 1 AS "column_1"', 'SELECT 2 AS "column_2"']
+    # EXPLAIN ANALYZE по умолчанию выключен
+    assert all(query.plan and not query.plan_analyzed for query in SlowQuery.objects.all())
+    assert not slow_queries._pending
+
+
+@pytest.mark.django_db
+def test_analyze_only_select(settings, monkeypatch):
+    monkeypatch.setattr(slow_queries, 'start_writer', lambda: None)
+    settings.SLOW_QUERY_ANALYZE_RATE = 1
+    slow_queries.capture(connection, 'SELECT 1 AS "one"', (), False, 1)
+    # CTE с изменением данных: EXPLAIN ANALYZE выполнил бы UPDATE второй раз
+    slow_queries.capture(
+        connection, 'WITH updated AS (UPDATE "shop_api_item" SET "quantity" = "quantity" - 1 RETURNING "id") SELECT * FROM updated',
+        (), False, 1)
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    (select_plan, select_analyzed), (with_plan, with_analyzed) = map(slow_queries.get_plan, list(slow_queries._pending))
+    assert select_analyzed and 'actual time' in select_plan
+    assert not with_analyzed and 'Update' in with_plan and 'actual time' not in with_plan
+
+
+@pytest.mark.django_db(transaction=True)
+def test_journal_is_written_outside_request(settings, catalog, api_client):
+    settings.SLOW_QUERY_FLUSH_INTERVAL = 60
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.get('/api/items//')
+    assert response.status_code == 200
+    # в соединении запроса нет ни EXPLAIN, ни записи журнала
+    assert not [query['sql'] for query in queries.captured_queries if 'EXPLAIN' in query['sql'] or 'shop_api_slowquery' in query['sql']]
+    assert slow_queries._writer.ident != threading.get_ident()
+
+    # поток записи просыпается по request_finished, не дожидаясь SLOW_QUERY_FLUSH_INTERVAL
+    deadline = time.monotonic() + 10
+    while not SlowQuery.objects.filter(example_sql__contains='"shop_api_item"').exists():
+        assert time.monotonic() < deadline, 'журнал медленных запросов не сохранен'
+        time.sleep(0.05)
+    assert SlowQuery.objects.filter(example_sql__contains='"shop_api_item"', plan__contains='Scan').exists()
@@ -0,0 +1,63 @@
+'''
+Выборочные поля (?fields=) и раскрытие связей (?expand=), см. shop_api.sparse_fields
+'''
+import pytest
+
+from shop_api.models import Order
+
+pytestmark = pytest.mark.django_db
+
+
+def test_list_returns_only_requested_fields(catalog, api_client):
+    response = api_client.get('/api/items//', {'fields': 'id,price,categories'})
+    assert response.status_code == 200
+    assert [set(row) for row in response.json()] == [{'id', 'price', 'categories'}] * len(catalog['items'])
+
+
+def test_retrieve_with_expand(catalog, api_client, vendor):
+    item = catalog['items'][0]
+    response = api_client.get(f'/api/items//{item.id}/', {'fields': 'id,vendor', 'expand': 'vendor,info'})
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {'id', 'vendor', 'info'}
+    assert data['vendor']['email'] == vendor.email
+    assert data['info'] == [{'type_info': 'Цвет', 'value_info': 'Черный'}]
+
+
+@pytest.mark.parametrize('params', [
+    {'fields': 'id,colour,weight'},
+    {'fields': 'id,colour,weight', 'page': 1},
+    {'fields': 'id,colour,weight', 'expand': 'vendor'},
+])
+def test_unknown_fields_are_rejected(catalog, api_client, params):
+    response = api_client.get('/api/items//', params)
+    assert response.status_code == 400
+    assert response.json() == {'fields': 'Неизвестные поля: colour, weight.'}
+
+
+def test_unknown_fields_are_rejected_on_retrieve(catalog, api_client):
+    response = api_client.get(f'/api/items//{catalog["items"][0].id}/', {'fields': 'name,colour'})
+    assert response.status_code == 400
+    assert response.json() == {'fields': 'Неизвестные поля: colour.'}
+
+
+def test_write_only_field_is_unknown(catalog, api_client):
+    # info на чтение доступен только через ?expand=info, без него поле не возвращается
+    response = api_client.get('/api/items//', {'fields': 'id,info'})
+    assert response.status_code == 200
+    assert [set(row) for row in response.json()] == [{'id'}] * len(catalog['items'])
+
+    response = api_client.get('/api/items//', {'fields': 'id,quantity_in_stock'})
+    assert response.status_code == 400
+
+
+def test_order_fields(customer, manager, auth_client):
+    Order.objects.create(user=customer, comment='Позвонить заранее')
+    client = auth_client(manager)
+    response = client.get('/api/order//', {'fields': 'state,comment'})
+    assert response.status_code == 200
+    assert response.json() == [{'state': 'basket', 'comment': 'Позвонить заранее'}]
+
+    response = client.get('/api/order//', {'fields': 'state,id'})
+    assert response.status_code == 400
+    assert response.json() == {'fields': 'Неизвестные поля: id.'}
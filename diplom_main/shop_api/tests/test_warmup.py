@@ -0,0 +1,58 @@
+'''
+Прогрев процесса после деплоя (shop_api.warmup)
+'''
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shop_api.authentication import get_tokens_for_user
+from shop_api.cache import _groups_key
+from shop_api.models import Order, OrderItem
+from shop_api.warmup import STEPS, run_warmup
+
+pytestmark = pytest.mark.django_db
+
+
+def test_all_steps(catalog):
+    report = run_warmup(timeout=30)
+    assert [(result['step'], result['status']) for result in report] == [(step, 'ok') for step in STEPS]
+
+
+def test_groups_of_recently_logged_in_users(settings, vendor, customer, manager):
+    settings.WARMUP_USERS = 2
+    # токены выдаются так же, как при входе; manager входил раньше всех и в лимит не попадает
+    for user in (manager, vendor, customer, vendor):
+        get_tokens_for_user(user)
+    # группы попадают в кэш уже при выдаче токена (claims), прогрев проверяем на пустом кэше
+    cache.clear()
+
+    [result] = run_warmup(timeout=30, steps=['groups'])
+    assert (result['status'], result['warmed']) == ('ok', 2)
+    assert cache.get(_groups_key(vendor.pk)) == {'vendor_base'}
+    assert cache.get(_groups_key(customer.pk)) == {'client_base'}
+    assert cache.get(_groups_key(manager.pk)) is None
+
+
+def test_items_warms_first_page_and_popular_items(settings, catalog, customer):
+    # ссылка на следующую страницу строится по хосту из ALLOWED_HOSTS (в .env - заглушка)
+    settings.ALLOWED_HOSTS = ['shop.example.com']
+    settings.API_PAGE_SIZE = 2
+    settings.WARMUP_POPULAR_ITEMS = 1
+    popular = catalog['items'][3]
+    OrderItem.objects.create(order=Order.objects.create(user=customer), item=popular, quantity=1)
+
+    with CaptureQueriesContext(connection) as queries:
+        [result] = run_warmup(timeout=30, steps=['items'])
+    assert result['status'] == 'ok'
+    assert result['warmed'] == 2
+
+    item_queries = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT "shop_api_item"."id"')]
+    # список читается одной страницей, а не целиком; затем выбираются и читаются популярные товары
+    assert [sql.rsplit(' ', 2)[1:] for sql in item_queries] == [['LIMIT', '2'], ['LIMIT', '1'], ['LIMIT', '21']]
+    assert f'WHERE "shop_api_item"."id" = {popular.id} ' in item_queries[2]
+
+
+def test_steps_are_skipped_after_timeout(catalog):
+    report = run_warmup(timeout=0)
+    assert {result['status'] for result in report} == {'skipped'}
@@ -2,11 +2,12 @@ from django.core.mail import send_mail, EmailMessage
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from weasyprint import HTML
 
 from django.contrib.auth import get_user_model
 from django.core.signing import dumps
 
+from .metrics import EMAIL_DURATION, PDF_DURATION
+
 User = get_user_model()
 
 
@@ -34,14 +35,15 @@ def send_customer_order_confirmation(order):
     from_email = settings.DEFAULT_FROM_EMAIL
     to_email = [order.user.email]
 
-    send_mail(
-        subject,
-        plain_message,
-        from_email,
-        to_email,
-        html_message=html_message,
-        fail_silently=False
-    )
+    with EMAIL_DURATION.time(kind='order_confirmation'):
+        send_mail(
+            subject,
+            plain_message,
+            from_email,
+            to_email,
+            html_message=html_message,
+            fail_silently=False
+        )
 
 
 def send_order_delivered_email(order):
@@ -54,20 +56,31 @@ def send_order_delivered_email(order):
     from_email = settings.DEFAULT_FROM_EMAIL
     to_email = [order.user.email]
 
-    send_mail(
-        subject,
-        plain_message,
-        from_email,
-        to_email,
-        html_message=html_message,
-        fail_silently=False)
+    with EMAIL_DURATION.time(kind='order_delivered'):
+        send_mail(
+            subject,
+            plain_message,
+            from_email,
+            to_email,
+            html_message=html_message,
+            fail_silently=False)
+
+
+def render_invoice_pdf(order):
+    """Накладная по заказу в PDF"""
+    # WeasyPrint вместе с fontTools загружается долго, поэтому импортируется при первой генерации
+    # накладной, а не при старте каждого воркера и команды manage.py (см. bench_startup)
+    from weasyprint import HTML
+
+    html_string = render_to_string('emails/invoice_template.html', {'order': order})
+    with PDF_DURATION.time():
+        html = HTML(string=html_string)
+        return html.write_pdf()
 
 
 def generate_and_send_invoice_pdf(order):
     """Генерация PDF и отправка на рабочую почту"""
-    html_string = render_to_string('emails/invoice_template.html', {'order': order})
-    html = HTML(string=html_string)
-    pdf = html.write_pdf()
+    pdf = render_invoice_pdf(order)
 
     subject = f'Новый заказ #{order.id} — накладная'
     from_email = settings.DEFAULT_FROM_EMAIL
@@ -81,4 +94,5 @@ def generate_and_send_invoice_pdf(order):
     )
     # Добавляем PDF как вложение
     email.attach(f'order_{order.id}.pdf', pdf, 'application/pdf')
-    email.send(fail_silently=False)
+    with EMAIL_DURATION.time(kind='invoice'):
+        email.send(fail_silently=False)
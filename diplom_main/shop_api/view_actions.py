@@ -0,0 +1,19 @@
+'''
+Представление и действие, которыми обрабатывается запрос: по ним middleware и пакет запросов
+подписывают метрики, бюджеты запросов и профили, не импортируя друг друга
+'''
+
+
+def get_view_action(request, view_func):
+    '''
+    Класс представления и действие: для ViewSet - имя action (list, get_my_orders),
+    для остальных представлений - HTTP-метод в нижнем регистре
+    '''
+    view_cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    return view_cls, actions.get(request.method.lower(), request.method.lower())
+
+
+def get_view_label(request, view_func):
+    view_cls, action = get_view_action(request, view_func)
+    return f'{view_cls.__name__ if view_cls else view_func.__name__}.{action}'
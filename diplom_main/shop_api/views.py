@@ -1,18 +1,24 @@
+import os
 import json
 import csv
 import datetime
+import functools
 
 from django.forms import ValidationError
 from django.urls import reverse
 from django.db import transaction
+from django.db.models import Prefetch
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.core.mail import send_mail
+from django.http import FileResponse, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.utils.html import strip_tags
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from django.contrib.auth.tokens import default_token_generator
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser
 from rest_framework.decorators import action
@@ -20,8 +26,6 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.exceptions import NotFound, PermissionDenied
 
@@ -29,8 +33,20 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 from .serializers import RegisterSerializer, UserInfoSerializer, LoginSerializer, PositionSerializer, StaffInfoSerializer, AddressClientSerializer, ItemInfoSerializer
 from .serializers import AddressManagerSerializer, VendorInfoSerializer, ItemSerializer, CategorySerializer, OrderSerializer, PasswordResetSerializer, PasswordResetConfirmSerializer
+from .serializers import BatchSerializer
 from .models import UserInfo, Position, StaffInfo, Address, VendorInfo, Item, Category, Order, OrderItem, ItemInfo
 from .permissions import IsInGroups, IsVendorOrManager
+from .cache import get_user_group_names
+from .authentication import ClaimsJWTAuthentication, get_tokens_for_user
+from .batch import execute_batch
+from .executors import ServiceOverloaded, get_auth_executor
+from .db_pool import get_connection_stats
+from .fast_serializers import FastListMixin, fast_item_serializer, fast_category_serializer, fast_order_serializer
+from .instrumentation import query_report
+from .pagination import EstimatedPageNumberPagination
+from .sparse_fields import SparseFieldsViewMixin
+from .metrics import registry, track_result, CHECKOUT_DURATION, CHECKOUT_ORDERS, IMPORT_DURATION, IMPORTS, IMPORT_ROWS, BASKET_OPERATIONS, BASKET_ITEMS
+from .profiling import get_profile_path, list_profiles
 from .utils import send_customer_order_confirmation, generate_and_send_invoice_pdf, send_order_delivered_email, generate_activation_token, validate_activation_token
 
 User = get_user_model()
@@ -45,6 +61,33 @@ def gen_error(serializer, error_status: status):
             }, status=error_status)
 
 
+def _call_and_render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def auth_pool_view(view):
+    '''
+    Асинхронная обертка над представлением, которое хеширует пароль.
+    Представление целиком выполняется в ограниченном пуле get_auth_executor(),
+    поэтому наплыв входов не занимает воркеры, обслуживающие остальные запросы.
+    При переполнении очереди пула запрос сразу отклоняется с кодом 503
+    '''
+    # атрибуты view_class/cls нужны middleware, чтобы определить представление
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await get_auth_executor().arun(_call_and_render, view, request, *args, **kwargs)
+        except ServiceOverloaded as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e.detail),
+            }, status=e.status_code, headers={'Retry-After': '1'})
+    return csrf_exempt(wrapper)
+
+
 class RegisterView(APIView):
     '''
     Представление для регистрации стандартного пользователя
@@ -157,7 +200,7 @@ class LoginView(APIView):
             return error_response
 
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = get_tokens_for_user(user)
         response_data = {
             'status': 'success'
         }
@@ -219,7 +262,7 @@ class UserInfoOwnerView(ModelViewSet):
 class PositionView(ModelViewSet):
     queryset = Position.objects.all()
     serializer_class = PositionSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
@@ -288,7 +331,7 @@ class AddressClientView(ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class AddressManagerView(ModelViewSet):
+class AddressManagerView(SparseFieldsViewMixin, ModelViewSet):
     serializer_class = AddressManagerSerializer
 
     def get_permissions(self):
@@ -298,7 +341,7 @@ class AddressManagerView(ModelViewSet):
         return Address.objects.all()
 
 
-class VendorInfoView(ModelViewSet):
+class VendorInfoView(SparseFieldsViewMixin, ModelViewSet):
     serializer_class = VendorInfoSerializer
 
     def get_permissions(self):
@@ -314,7 +357,7 @@ class VendorInfoView(ModelViewSet):
 
     def get_object(self):
         user_id = self.kwargs.get('pk')
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
 
         try:
             obj = queryset.get(user_id=user_id)
@@ -336,7 +379,7 @@ class VendorInfoView(ModelViewSet):
                 'group': 'Группа "vendor_base" не найдена. Пожалуйста, создайте её в админке.'
             })
 
-        if not user.groups.filter(name='vendor_base').exists():
+        if 'vendor_base' not in get_user_group_names(user):
             user.groups.add(vendor_group)
 
         self.perform_create(serializer)
@@ -363,8 +406,14 @@ class VendorInfoView(ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
-class ItemView(ModelViewSet):
+class ItemView(FastListMixin, SparseFieldsViewMixin, ModelViewSet):
     serializer_class = ItemSerializer
+    fast_serializer = fast_item_serializer
+    replica_read_actions = ['list', 'retrieve']
+    pagination_class = EstimatedPageNumberPagination
+    # третий запрос - характеристики товаров при ?expand=info, еще два при ?page= - оценка
+    # числа товаров по статистике PostgreSQL и COUNT(*) или EXPLAIN (см. shop_api.pagination.estimate_count)
+    query_budgets = {'list': 5, 'retrieve': 3, 'add_to_basket': 10}
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     searCLEARch_fields = ['name', 'description', 'vendor', 'categories_name']
     ordering_fields = ['price', 'updated_at', 'vendor', 'is_active', 'quantity']
@@ -391,7 +440,8 @@ class ItemView(ModelViewSet):
             category_list = category_ids.split(',')
             queryset = Item.objects.filter(categories__id__in=category_list).distinct()
 
-        return queryset
+        # порядок категорий как у fast_item_serializer
+        return queryset.prefetch_related(Prefetch('categories', queryset=Category.objects.order_by('id')))
 
     def perform_create(self, serializer):
         return serializer.save(vendor=self.request.user)
@@ -470,14 +520,20 @@ class ItemView(ModelViewSet):
         basket.total_price = sum(i.total_price() for i in basket.order_item.all())
         basket.save()
 
+        BASKET_OPERATIONS.inc(operation='add')
+        BASKET_ITEMS.inc(int(quantity), operation='add')
+
         return Response({
             'status': 'success',
             'data': self.request.data
         }, status=status.HTTP_201_CREATED)
 
 
-class CategoryView(ModelViewSet):
+class CategoryView(FastListMixin, ModelViewSet):
     serializer_class = CategorySerializer
+    fast_serializer = fast_category_serializer
+    replica_read_actions = ['list', 'retrieve']
+    query_budgets = {'list': 2, 'retrieve': 2}
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -486,7 +542,7 @@ class CategoryView(ModelViewSet):
             return [IsAuthenticated(), IsInGroups(['employee_base', 'manager_base', ])]
 
     def get_queryset(self):
-        return Category.objects.all()
+        return Category.objects.prefetch_related(Prefetch('items', queryset=Item.objects.order_by('id').only('id')))
 
     @action(detail=False, methods=['POST'])
     def add_item(self, request):
@@ -571,8 +627,12 @@ def __get_order_and_change_state(pk, state):
     }, status=status.HTTP_200_OK)
 
 
-class OrderView(ModelViewSet):
+class OrderView(FastListMixin, SparseFieldsViewMixin, ModelViewSet):
     serializer_class = OrderSerializer
+    fast_serializer = fast_order_serializer
+    replica_read_actions = ['list', 'retrieve', 'get_my_orders']
+    pagination_class = EstimatedPageNumberPagination
+    query_budgets = {'get_my_orders': 1}
 
     def get_queryset(self):
         return Order.objects.all()
@@ -603,22 +663,21 @@ class OrderView(ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def get_my_orders(self, request):
-        orders = Order.objects.filter(user=request.user).exclude(state='basket')
+        orders = fast_order_serializer.serialize(Order.objects.filter(user=request.user).exclude(state='basket'))
 
-        if not orders.exists():
+        if not orders:
             return Response({
                 'status': 'error',
                 'message': 'У Вас нет заказов.'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(orders, many=True)
-
         return Response({
             'status': 'success',
-            'data': serializer.data,
+            'data': orders,
         }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['patch'])
+    @track_result(CHECKOUT_DURATION, CHECKOUT_ORDERS)
     def start_order(self, request, pk):
         try:
             order_obj = Order.objects.get(pk=pk)
@@ -670,15 +729,15 @@ class OrderView(ModelViewSet):
 
     @action(detail=True, methods=['patch'])
     def order_collecting(self, request, pk):
-        return __get_order_and_change_state(pk, 'collecting')
+        return self.__get_order_and_change_state(pk, 'collecting')
 
     @action(detail=True, methods=['patch'])
     def order_collected(self, request, pk):
-        return __get_order_and_change_state(pk, 'collected')
+        return self.__get_order_and_change_state(pk, 'collected')
 
     @action(detail=True, methods=['patch'])
     def order_shipped(self, request, pk):
-        return __get_order_and_change_state(pk, 'shipped')
+        return self.__get_order_and_change_state(pk, 'shipped')
 
     @action(detail=True, methods=['patch'])
     def order_delivered(self, request, pk):
@@ -724,10 +783,38 @@ class OrderView(ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 
+def parse_csv_row(row, vendor):
+    '''
+    Строка CSV в данные для ItemSerializer: пары type_N/value_N собираются в info
+    '''
+    info_list = []
+    row_copy = row.copy()
+
+    i = 1
+    while True:
+        type_key = f'type_{i}'
+        value_key = f'value_{i}'
+        if type_key in row and value_key in row and row[type_key] and row[value_key]:
+            info_list.append({
+                'type_info': row[type_key],
+                'value_info': row[value_key]})
+
+            row_copy.pop(type_key, None)
+            row_copy.pop(value_key, None)
+        else:
+            break
+        i += 1
+
+    row_copy['vendor'] = vendor
+    row_copy['info'] = info_list
+    return row_copy
+
+
 class UploadItemsCSV(APIView):
     parser_classes = [MultiPartParser]
     permission_classes = [IsAuthenticated, IsVendorOrManager]
 
+    @track_result(IMPORT_DURATION, IMPORTS)
     def post(self, request, *args, **kwargs):
         file = request.FILES.get('file')
 
@@ -752,7 +839,7 @@ class UploadItemsCSV(APIView):
         items_to_create = []
         errors = []
 
-        if 'manager_base' in [group.name for group in request.user.groups.all()]:
+        if 'manager_base' in get_user_group_names(request.user):
             vendor = request.data.get('vendor')
             if not vendor:
                 return Response({'error': 'В запросе не указан поставщик.', }, status=status.HTTP_400_BAD_REQUEST)
@@ -760,34 +847,15 @@ class UploadItemsCSV(APIView):
             vendor = request.user.id
 
         for row in csv_reader:
-            info_list = []
-            row_copy = row.copy()
-
-            i = 1
-            while True:
-                type_key = f'type_{i}'
-                value_key = f'value_{i}'
-                if type_key in row and value_key in row and row[type_key] and row[value_key]:
-                    info_list.append({
-                        'type_info': row[type_key],
-                        'value_info': row[value_key]})
-
-                    row_copy.pop(type_key, None)
-                    row_copy.pop(value_key, None)
-                else:
-                    break
-                i += 1
-
-            row_copy['vendor'] = vendor
-            row_copy['info'] = info_list
-
-            serializer = ItemSerializer(data=row_copy)
+            serializer = ItemSerializer(data=parse_csv_row(row, vendor))
             if serializer.is_valid():
                 items_to_create.append(serializer.validated_data)
             else:
                 errors.append(serializer.errors)
 
         if errors:
+            IMPORT_ROWS.inc(len(errors), result='invalid')
+            IMPORT_ROWS.inc(len(items_to_create), result='skipped')
             return Response({
                 'status': 'partial_success',
                 'created': len(items_to_create),
@@ -813,7 +881,9 @@ class UploadItemsCSV(APIView):
                     'error': str(e)
                 })
 
+        IMPORT_ROWS.inc(len(created_items), result='created')
         if errors:
+            IMPORT_ROWS.inc(len(errors), result='failed')
             return Response({
                 'status': 'partial_success',
                 'created': len(created_items),
@@ -828,6 +898,8 @@ class UploadItemsCSV(APIView):
 
 class ItemInfoView(ModelViewSet):
     serializer_class = ItemInfoSerializer
+    replica_read_actions = ['list', 'retrieve']
+    pagination_class = EstimatedPageNumberPagination
     queryset = ItemInfo.objects.all()
 
     def get_permissions(self):
@@ -849,3 +921,95 @@ class ItemInfoView(ModelViewSet):
             'status': 'success',
             'message': f'Информация "{instance.type_info}" удалена.'
         }, status=status.HTTP_200_OK)
+
+
+class BatchView(APIView):
+    '''
+    Несколько запросов к API за один HTTP-запрос (см. shop_api.batch).
+    Пакет аутентифицируется один раз, операции выполняются от имени того же пользователя
+    '''
+    batchable = False
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return gen_error(serializer, status.HTTP_400_BAD_REQUEST)
+
+        results, wrote = execute_batch(request, serializer.validated_data['operations'], serializer.validated_data['atomic'])
+        # пакет из одних чтений не закрепляет пользователя за основной БД
+        request._request.replica_pin = wrote
+
+        failed = sum(result['status'] >= 400 for result in results)
+        if not failed:
+            batch_status = 'success'
+        elif serializer.validated_data['atomic'] or failed == len(results):
+            batch_status = 'error'
+        else:
+            batch_status = 'partial_success'
+        return Response({
+            'status': batch_status,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class DBPoolStatsView(APIView):
+    '''
+    Состояние соединений с БД процесса, обработавшего запрос
+    '''
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'databases': {alias: get_connection_stats(alias) for alias in settings.DATABASES},
+        }, status=status.HTTP_200_OK)
+
+
+class QueryReportView(APIView):
+    '''
+    Статистика запросов к БД по представлениям процесса, обработавшего запрос.
+    DELETE сбрасывает накопленную статистику
+    '''
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'views': query_report.snapshot(),
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        query_report.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileListView(APIView):
+    '''
+    Сохраненные профили запросов (см. ProfilingMiddleware)
+    '''
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response([
+            {**profile, 'created_at': datetime.datetime.fromtimestamp(profile['created_at'], tz=datetime.timezone.utc).isoformat()}
+            for profile in list_profiles()
+        ], status=status.HTTP_200_OK)
+
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name):
+        path = get_profile_path(name)
+        if path is None:
+            raise NotFound('Профиль не найден.')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+def metrics_view(request):
+    '''
+    Метрики всех воркеров в формате Prometheus
+    '''
+    if settings.METRICS_TOKEN and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
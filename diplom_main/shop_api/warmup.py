@@ -0,0 +1,127 @@
+'''
+Прогрев процесса после деплоя: python manage.py warmup или GUNICORN_WARMUP=True (см. gunicorn/gunicorn.conf.py).
+
+Шаги выполняют тот же код, что и обработка запросов: URLconf с представлениями,
+компиляция шаблонов писем, кэш групп недавно входивших пользователей, список категорий
+и популярные товары через представления API (без middleware, метрики запросов не меняются).
+Прогрев ограничен по времени: шаги, до которых не дошла очередь, и оставшиеся объекты
+шага пропускаются. Кэш шаблонов и URLconf у каждого процесса свой, кэш групп - общий,
+если CACHES настроен на общий бэкенд.
+'''
+import os
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from .cache import cache_user_groups
+from .models import Item
+
+# шаги без обращений к БД: их можно выполнять в мастере gunicorn до fork
+PROCESS_STEPS = ('urls', 'templates')
+
+
+class WarmupTimeout(Exception):
+    pass
+
+
+class Warmup:
+    '''
+    Шаги прогрева - методы класса; каждый увеличивает warmed на число прогретых объектов
+    '''
+    def __init__(self, timeout):
+        self.deadline = time.monotonic() + timeout
+        self.factory = RequestFactory(SERVER_NAME=self.host())
+        self.warmed = 0
+
+    @staticmethod
+    def host():
+        # запрос должен пройти проверку ALLOWED_HOSTS, если представление обратится к get_host()
+        return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+
+    def expired(self):
+        return time.monotonic() > self.deadline
+
+    def check_deadline(self):
+        if self.expired():
+            raise WarmupTimeout()
+
+    def get(self, path):
+        '''
+        GET-запрос к представлению API в обход middleware
+        '''
+        self.check_deadline()
+        match = resolve(path.split('?')[0])
+        response = match.func(self.factory.get(path), *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{path} вернул статус {response.status_code}')
+        self.warmed += 1
+
+    def urls(self):
+        self.warmed += len(get_resolver().url_patterns)
+
+    def templates(self):
+        for directory in settings.TEMPLATES[0]['DIRS']:
+            for root, _, files in os.walk(directory):
+                for name in sorted(files):
+                    if name.endswith('.html'):
+                        self.check_deadline()
+                        get_template(os.path.relpath(os.path.join(root, name), directory))
+                        self.warmed += 1
+
+    def groups(self):
+        # last_login не обновляется (UPDATE_LAST_LOGIN = False), а refresh-токен записывается при каждом входе
+        user_ids = list(
+            OutstandingToken.objects.filter(user__isnull=False).values('user_id').annotate(last_token=Max('created_at'))
+            .order_by('-last_token').values_list('user_id', flat=True)[:settings.WARMUP_USERS])
+        self.check_deadline()
+        self.warmed += cache_user_groups(user_ids)
+
+    def categories(self):
+        self.get('/api/categories//')
+
+    def items(self):
+        # первая страница списка, как у клиентов с ?page=; весь каталог одним ответом клиенты не запрашивают
+        self.get('/api/items//?page=1')
+        popular = list(
+            Item.objects.filter(is_active=True).annotate(orders=Count('item_order')).order_by('-orders', 'id')
+            .values_list('id', flat=True)[:settings.WARMUP_POPULAR_ITEMS])
+        for item_id in popular:
+            self.get(f'/api/items//{item_id}/')
+
+
+STEPS = ('urls', 'templates', 'groups', 'categories', 'items')
+
+
+def run_warmup(timeout=None, steps=STEPS):
+    '''
+    Выполняет шаги прогрева и возвращает отчет: [{'step', 'status', 'warmed', 'duration_ms'}].
+    status: ok, timeout (шаг прерван по времени), skipped (время вышло до начала шага), error
+    '''
+    warmup = Warmup(settings.WARMUP_TIMEOUT if timeout is None else timeout)
+    report = []
+    for step in steps:
+        result = {'step': step, 'status': 'ok'}
+        started = time.perf_counter()
+        warmup.warmed = 0
+        if warmup.expired():
+            result['status'] = 'skipped'
+        else:
+            try:
+                getattr(warmup, step)()
+            except WarmupTimeout:
+                result['status'] = 'timeout'
+            except Exception as e:
+                # прогрев не должен мешать запуску: ошибка шага попадает в отчет
+                result['status'] = 'error'
+                result['error'] = str(e)
+        result['warmed'] = warmup.warmed
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        report.append(result)
+    return report
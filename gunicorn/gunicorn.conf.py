@@ -0,0 +1,91 @@
+'''
+Профиль gunicorn для production: gunicorn --config gunicorn/gunicorn.conf.py
+
+Приложение загружается один раз в мастер-процессе (preload_app) и прогревается там же,
+воркеры получают его через fork и делят страницы памяти с мастером (copy-on-write).
+Чтобы сборщик мусора воркеров не копировал эти страницы, обходя унаследованные объекты,
+они переводятся в постоянное поколение (gc.freeze) перед запуском воркеров.
+Соединения с БД (и пулы psycopg_pool) мастер закрывает до fork, каждый воркер открывает свой пул.
+
+Настройки переопределяются переменными окружения:
+GUNICORN_WORKER_CLASS - sync, gthread (по умолчанию) или uvicorn_worker.UvicornWorker
+(для него загружается diplom_main.asgi), GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_BIND,
+GUNICORN_PRELOAD=False - каждый воркер импортирует приложение сам,
+GUNICORN_WARMUP=True - воркер перед приемом запросов выполняет прогрев (см. shop_api.warmup).
+Память воркеров и время холодного старта: python manage.py bench_workers
+'''
+import gc
+import os
+
+ASGI_WORKER_CLASSES = ('uvicorn_worker.UvicornWorker', 'uvicorn.workers.UvicornWorker')
+
+# каталог с manage.py, чтобы конфиг работал при запуске из корня репозитория
+pythonpath = os.environ.get('GUNICORN_PYTHONPATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'diplom_main'))
+
+bind = os.environ.get('GUNICORN_BIND', 'unix:/run/gunicorn.sock')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# для gthread: потоков в воркере; соединений с БД у воркера до DB_POOL_MAX_SIZE
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+# прогрев каждого воркера перед приемом запросов (кэш групп, категории, популярные товары), не дольше WARMUP_TIMEOUT
+warmup_workers = os.environ.get('GUNICORN_WARMUP', 'False') == 'True'
+wsgi_app = 'diplom_main.asgi:application' if worker_class in ASGI_WORKER_CLASSES else 'diplom_main.wsgi:application'
+
+if preload_app:
+    # без сборок мусора во время загрузки приложения в памяти мастера не остается «дыр»
+    # от освобожденных объектов, которые воркеры потом заполняли бы, копируя страницы
+    gc.disable()
+
+
+def close_db_connections():
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        # нативный пул django 5.2 держит соединения и фоновые потоки, которые не переживают fork
+        close_pool = getattr(connection, 'close_pool', None)
+        if close_pool is not None:
+            close_pool()
+
+
+def log_warmup(log, report):
+    for result in report:
+        log.info('Прогрев %s: %s, прогрето %s за %s мс', result['step'], result['status'], result['warmed'], result['duration_ms'])
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from shop_api.warmup import PROCESS_STEPS, run_warmup
+
+    # то, что не зависит от БД, прогревается один раз и достается воркерам через fork
+    log_warmup(server.log, run_warmup(steps=PROCESS_STEPS))
+    close_db_connections()
+    gc.freeze()
+    gc.enable()
+    server.log.info('Приложение загружено в мастере, объектов в постоянном поколении: %s', gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    # без preload Django в воркере еще не настроен: приложение загружается после этого хука
+    if not preload_app:
+        return
+    # мастер закрыл свои соединения до fork, поэтому воркер открывает собственный пул сразу,
+    # не дожидаясь первого запроса; соединения устанавливаются в фоне
+    from django.db import connections
+
+    pool = getattr(connections['default'], 'pool', None)
+    if pool is not None:
+        pool.open(wait=False)
+
+
+def post_worker_init(worker):
+    if not warmup_workers:
+        return
+    from django.db import connections
+    from shop_api.warmup import run_warmup
+
+    log_warmup(worker.log, run_warmup())
+    # соединения прогрева возвращаются в пул, а не остаются за главным потоком воркера
+    connections.close_all()